@@ -1,49 +0,0 @@
-import json
-from django.http import JsonResponse
-from django.views.decorators.csrf import csrf_exempt
-from .models import User
-from .models import Post
-
-
-# Create your views here.
-def get_users(request):
-    try:
-        users = list(User.objects.values('id', 'username', 'email', 'created_at'))
-        return JsonResponse(users, safe=False)
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
-
-@csrf_exempt
-def create_user(request):
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            user = User.objects.create(username=data['username'], email=data['email'])
-            return JsonResponse({'id': user.id, 'message': 'User created successfully'}, status=201)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
-
-@csrf_exempt
-def update_user(request, id):
-    if request.method == 'PUT':
-        try:
-            data = json.loads(request.body)
-            email = data['email']
-            user = User.objects.filter(id=id).first()
-            # data = UserSerializer(isinstance=user, data=request.data)
-            user.email = email
-            user.save()
-            return JsonResponse({'message': 'User updated successfully'}, status=201)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
-
-@csrf_exempt
-def delete_user(request, id):
-    if request.method == 'DELETE':
-        try:
-            user = User.objects.filter(id=id).first()
-            user.delete()
-            #User.objects.delete(id=id)
-            return JsonResponse({'message': 'User deleted successfully'}, status=200)
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=400)
\ No newline at end of file
@@ -28,7 +28,6 @@ ALLOWED_HOSTS = []
 
 # Application definition
 INSTALLED_APPS = [
-    'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -54,6 +53,11 @@ INSTALLED_APPS = [
     'posts',
 ]
 
+# API-only workers can skip importing the admin stack entirely
+ENABLE_ADMIN = os.getenv("CONNECTLY_ENABLE_ADMIN", "True") == "True"
+if ENABLE_ADMIN:
+    INSTALLED_APPS.insert(0, 'django.contrib.admin')
+
 # Authentication settings
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
@@ -94,13 +98,55 @@ GOOGLE_OAUTH2_REDIRECT_URI = os.getenv("GOOGLE_OAUTH2_REDIRECT_URI")
 ACCOUNT_ADAPTER = "allauth.account.adapter.DefaultAccountAdapter"
 SOCIALACCOUNT_ADAPTER = "allauth.socialaccount.adapter.DefaultSocialAccountAdapter"
 
+# Background task queue (see posts/taskqueue.py); run workers with `manage.py run_tasks`
+TASK_QUEUE = {
+    'EAGER': os.getenv("TASK_QUEUE_EAGER", "False") == "True",  # Run tasks inline, e.g. in tests
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 10,
+}
+
+# Rows deleted per transaction when purging soft-deleted users and posts
+PURGE_CHUNK_SIZE = 500
+
+# Posts older than this many days are moved to the archive tables by
+# `manage.py archive_posts`
+ARCHIVE_AFTER_DAYS = 90
+
+# Caching: a short-lived per-process L1 in front of a cache shared by every
+# worker and node (Redis when CONNECTLY_REDIS_URL is set, files otherwise)
+REDIS_URL = os.getenv("CONNECTLY_REDIS_URL")
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'posts.cache.TieredCache',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_TIMEOUT': 5,
+            'EPOCH_CHECK_INTERVAL': 1,
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        # Development only: a single-host stand-in for Redis. The default
+        # MAX_ENTRIES of 300 would cull cached entries at random
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    },
 }
 
+# Sessions are stored in the database and read through the shared cache, so
+# any node can serve any request and cache eviction never logs anyone out
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'shared'
+
+# Responses to writes sent with an Idempotency-Key header are stored in the
+# database and replayed for this long (see posts/idempotency.py). Expired
+# ones are purged by the `manage.py run_tasks` worker, which must be running
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
 
 # DRF Authentication Settings
 REST_FRAMEWORK = {
@@ -118,6 +164,7 @@ LOGOUT_REDIRECT_URL = "/"
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'posts.middleware.CompressionMiddleware',  # gzip/br/zstd, negotiated via Accept-Encoding
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -127,6 +174,9 @@ MIDDLEWARE = [
 
 ]
 
+# Responses smaller than this (in bytes) are not compressed
+COMPRESSION_MIN_SIZE = 512
+
 # Custom User Model
 AUTH_USER_MODEL = 'posts.User'
 
@@ -0,0 +1,26 @@
+"""Gunicorn settings for running Connectly with a preloaded application.
+
+    gunicorn -c gunicorn.conf.py
+
+The master imports Django, the URLconf and every view once, then forks the
+workers, which share those pages copy-on-write instead of each importing the
+full stack again.
+"""
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'connectly_project.wsgi:application'
+bind = os.getenv('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+preload_app = True
+
+
+def when_ready(server):
+    # Import every view module before forking so the workers never do it
+    from django.urls import get_resolver
+
+    get_resolver().url_patterns
+    # Move everything allocated so far out of the collector's reach; otherwise
+    # the first collection in each worker touches (and copies) every page
+    gc.freeze()
@@ -0,0 +1,169 @@
+"""Two-tier cache backend: a short-lived in-process L1 in front of a shared L2.
+
+Reads are served from the per-process ``LocMemCache`` when possible and fall
+back to the shared backend (Redis in production, the file cache locally).
+Writes go through to both tiers, bump an epoch counter kept in L2 and
+record the written key in an L2 journal entry for the new epoch. Every
+process compares that epoch with the one it last saw, at most once per
+``EPOCH_CHECK_INTERVAL`` seconds, and drops just the journalled keys from its
+L1. If it fell too far behind, or journal entries are missing, it drops its
+whole L1 instead. A write is therefore visible everywhere within that
+interval, and no L1 entry outlives ``L1_TIMEOUT`` either way. A successful
+``add()`` creates a key nobody can have cached, so it is not journalled.
+
+The journal needs an L2 with an atomic ``incr`` (Redis, Memcached). Backends
+that inherit ``BaseCache.incr``, such as the file and database caches, do a
+separate get and set, so two concurrent writes can share an epoch and one of
+their journal entries is lost. With those, every epoch change drops the
+whole L1, and a write whose increment was lost may go unnoticed until
+``L1_TIMEOUT``; they are only fit for development.
+
+Configure it as::
+
+    'default': {
+        'BACKEND': 'posts.cache.TieredCache',
+        'OPTIONS': {'L2': 'shared', 'L1_TIMEOUT': 5, 'EPOCH_CHECK_INTERVAL': 1},
+    }
+"""
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+EPOCH_KEY = 'tiered-cache:epoch'
+JOURNAL_KEY = 'tiered-cache:invalidated:%d'
+JOURNAL_TIMEOUT = 300
+
+_missing = object()
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = options.get('L2', 'shared')
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.epoch_interval = options.get('EPOCH_CHECK_INTERVAL', 1.0)
+        # Processes further behind than this many writes drop their whole L1
+        self.journal_size = options.get('JOURNAL_SIZE', 500)
+        # LocMemCache shares storage by name, so all threads of a process use one L1
+        self.l1 = LocMemCache(f"tiered:{location or 'default'}", {
+            'TIMEOUT': self.l1_timeout,
+            'OPTIONS': {'MAX_ENTRIES': options.get('L1_MAX_ENTRIES', 1000)},
+        })
+        self._epoch = None
+        self._epoch_checked_at = 0.0
+        self.l1_hits = self.l2_hits = self.misses = 0
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    @property
+    def journalled(self):
+        return type(self.l2).incr is not BaseCache.incr
+
+    def _l1_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT or timeout is None:
+            return self.l1_timeout
+        return min(timeout, self.l1_timeout)
+
+    def _sync_epoch(self):
+        now = time.monotonic()
+        if now - self._epoch_checked_at < self.epoch_interval:
+            return
+        self._epoch_checked_at = now
+        epoch = self.l2.get(EPOCH_KEY, 0)
+        if epoch != self._epoch:
+            if self._epoch is not None:
+                self._invalidate(self._epoch, epoch)
+            self._epoch = epoch
+
+    def _invalidate(self, seen, epoch):
+        """Drop the keys written in epochs ``seen + 1`` to ``epoch`` from L1."""
+        if not self.journalled or not 0 < epoch - seen <= self.journal_size:
+            # No reliable journal, too far behind, or L2 was cleared and the
+            # epoch restarted
+            self.l1.clear()
+            return
+        journal = [JOURNAL_KEY % n for n in range(seen + 1, epoch + 1)]
+        entries = self.l2.get_many(journal)
+        if len(entries) < len(journal):
+            # Expired, or another process has not written its entry yet
+            self.l1.clear()
+            return
+        for key, version in entries.values():
+            self.l1.delete(key, version=version)
+
+    def _broadcast(self, key, version):
+        """Tell every other process to drop ``key`` from its L1."""
+        if self.l2.add(EPOCH_KEY, 1, timeout=None):
+            epoch = 1
+        else:
+            epoch = self.l2.incr(EPOCH_KEY)
+        if self.journalled:
+            self.l2.set(JOURNAL_KEY % epoch, (key, version), JOURNAL_TIMEOUT)
+        if self._epoch is not None and epoch != self._epoch + 1:
+            # Someone else wrote since our last check as well
+            self._invalidate(self._epoch, epoch - 1)
+        self._epoch = epoch
+        self._epoch_checked_at = time.monotonic()
+
+    def get(self, key, default=None, version=None):
+        self._sync_epoch()
+        value = self.l1.get(key, _missing, version=version)
+        if value is not _missing:
+            self.l1_hits += 1
+            return value
+        value = self.l2.get(key, _missing, version=version)
+        if value is _missing:
+            self.misses += 1
+            return default
+        self.l2_hits += 1
+        self.l1.set(key, value, self.l1_timeout, version=version)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self._broadcast(key, version)
+        self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, timeout, version=version)
+        if added:
+            self.l1.set(key, value, self._l1_timeout(timeout), version=version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.touch(key, self._l1_timeout(timeout), version=version)
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        deleted = self.l2.delete(key, version=version)
+        self.l1.delete(key, version=version)
+        self._broadcast(key, version)
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        value = self.l2.incr(key, delta, version=version)
+        self.l1.delete(key, version=version)
+        self._broadcast(key, version)
+        return value
+
+    def clear(self):
+        self.l2.clear()
+        self.l1.clear()
+        self._epoch = None
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+    def stats(self):
+        lookups = self.l1_hits + self.l2_hits + self.misses
+        return {
+            'l1_hits': self.l1_hits,
+            'l2_hits': self.l2_hits,
+            'misses': self.misses,
+            'hit_rate': (self.l1_hits + self.l2_hits) / lookups if lookups else 0.0,
+        }
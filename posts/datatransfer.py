@@ -0,0 +1,215 @@
+"""Streaming export/import of users, posts, comments, likes and the archive.
+
+Each table is written as a sequence of chunk files (``posts-000001.ndjson``
+or ``.parquet``) read with keyset pagination and ``iterator()``, so memory
+stays flat regardless of table size. ``checkpoint.json`` in the target
+directory records progress after every finished file; re-running a command
+against the same directory resumes where it stopped.
+"""
+import datetime
+import json
+import os
+from contextlib import contextmanager
+
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post, User
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet support is optional
+    pyarrow = None
+
+FORMATS = ['ndjson', 'parquet']
+CHECKPOINT_FILE = 'checkpoint.json'
+
+# Export order is also import order, so foreign keys always resolve
+TABLES = [
+    ('users', User, lambda: User.objects.filter(deleted_at__isnull=True), [
+        'id', 'username', 'email', 'password', 'first_name', 'last_name', 'is_staff', 'is_superuser',
+        'is_active', 'date_joined', 'last_login', 'created_at', 'role',
+    ]),
+    ('posts', Post, lambda: Post.objects.filter(author__deleted_at__isnull=True), [
+        'id', 'content', 'author_id', 'created_at', 'privacy',
+    ]),
+    ('comments', Comment, lambda: Comment.objects.filter(post__deleted_at__isnull=True, author__deleted_at__isnull=True), [
+        'id', 'text', 'author_id', 'post_id', 'created_at',
+    ]),
+    ('likes', Post.likes.through, lambda: Post.likes.through.objects.filter(
+        post__deleted_at__isnull=True, user__deleted_at__isnull=True,
+    ), [
+        'id', 'post_id', 'user_id',
+    ]),
+    ('archived_posts', ArchivedPost, lambda: ArchivedPost.objects.filter(author__deleted_at__isnull=True), [
+        'id', 'content', 'author_id', 'created_at', 'privacy', 'like_user_ids', 'archived_at',
+    ]),
+    ('archived_comments', ArchivedComment, lambda: ArchivedComment.objects.filter(
+        post__author__deleted_at__isnull=True, author__deleted_at__isnull=True,
+    ), [
+        'id', 'text', 'author_id', 'post_id', 'created_at',
+    ]),
+]
+
+
+def check_format(file_format):
+    if file_format == 'parquet' and pyarrow is None:
+        raise ValueError("Parquet files need the pyarrow package.")
+
+
+def load_checkpoint(directory):
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(directory, checkpoint):
+    path = os.path.join(directory, CHECKPOINT_FILE)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _write_chunk(path, fields, rows, file_format):
+    """Write ``rows`` (an iterator of tuples) to ``path`` and return the last row."""
+    last = None
+    if file_format == 'ndjson':
+        with open(path + '.tmp', 'w') as f:
+            for row in rows:
+                f.write(json.dumps(dict(zip(fields, row)), default=_json_default))
+                f.write('\n')
+                last = row
+    else:
+        columns = {name: [] for name in fields}
+        for row in rows:
+            for name, value in zip(fields, row):
+                columns[name].append(value)
+            last = row
+        if last is not None:
+            pyarrow.parquet.write_table(pyarrow.table(columns), path + '.tmp')
+    if last is not None:
+        os.replace(path + '.tmp', path)
+    elif os.path.exists(path + '.tmp'):
+        os.remove(path + '.tmp')
+    return last
+
+
+class _CountingIterator:
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def export_table(directory, name, queryset, fields, file_format, rows_per_file, chunk_size, checkpoint):
+    """Export one table, resuming after the last checkpointed primary key. Returns rows written."""
+    state = checkpoint.setdefault(name, {'last_pk': 0, 'files': [], 'done': False})
+    written = 0
+    while not state['done']:
+        rows = (
+            queryset.filter(pk__gt=state['last_pk'])
+            .order_by('pk')
+            .values_list(*fields)[:rows_per_file]
+            .iterator(chunk_size=chunk_size)
+        )
+        filename = f"{name}-{len(state['files']) + 1:06d}.{file_format}"
+        counted = _CountingIterator(rows)
+        last = _write_chunk(os.path.join(directory, filename), fields, counted, file_format)
+        if last is None:
+            state['done'] = True
+        else:
+            state['last_pk'] = last[0]
+            state['files'].append(filename)
+            written += counted.count
+        save_checkpoint(directory, checkpoint)
+    return written
+
+
+def _read_chunk(path, file_format, batch_size):
+    """Yield lists of row dicts of at most ``batch_size`` rows."""
+    if file_format == 'ndjson':
+        batch = []
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    batch.append(json.loads(line))
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+    else:
+        for record_batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield record_batch.to_pylist()
+
+
+@contextmanager
+def _preserve_timestamps(model):
+    """Keep exported created_at values instead of letting auto_now_add overwrite them."""
+    fields = [field for field in model._meta.concrete_fields if getattr(field, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def _build(model, row, datetime_fields):
+    for name in datetime_fields:
+        if isinstance(row.get(name), str):
+            row[name] = parse_datetime(row[name])
+    return model(**row)
+
+
+def import_table(directory, name, model, file_format, batch_size, checkpoint, checkpoint_dir=None):
+    """Import every not yet imported chunk file of one table. Returns rows read.
+
+    Rows whose primary key is already in the table are skipped, so a file
+    that committed just before an interruption can be imported again.
+    """
+    state = checkpoint.setdefault(name, {'files': []})
+    done = set(state['files'])
+    datetime_fields = [f.attname for f in model._meta.concrete_fields if isinstance(f, models.DateTimeField)]
+    suffix = f".{file_format}"
+    filenames = sorted(
+        f for f in os.listdir(directory)
+        if f.startswith(f"{name}-") and f.endswith(suffix) and f not in done
+    )
+
+    count = 0
+    with _preserve_timestamps(model):
+        for filename in filenames:
+            # One transaction per file, so an interrupted file is simply redone
+            with transaction.atomic():
+                for batch in _read_chunk(os.path.join(directory, filename), file_format, batch_size):
+                    model.objects.bulk_create(
+                        [_build(model, row, datetime_fields) for row in batch], ignore_conflicts=True,
+                    )
+                    count += len(batch)
+            state['files'].append(filename)
+            save_checkpoint(checkpoint_dir or directory, checkpoint)
+    return count
+
+
+def reset_sequences():
+    """Move primary key sequences past the imported ids (a no-op on SQLite)."""
+    statements = connection.ops.sequence_reset_sql(no_style(), [model for _, model, _, _ in TABLES])
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
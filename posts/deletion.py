@@ -0,0 +1,144 @@
+"""Soft deletes and the chunked purges that follow them.
+
+Deleting through Django's collector loads every dependent row into memory
+and sends a signal per row, all inside one long write transaction. Instead a
+delete request only stamps ``deleted_at`` with a few UPDATE statements, which
+hides the content immediately, and a background task then removes the rows
+bottom-up (likes, comments, posts) in short transactions of at most
+``PURGE_CHUNK_SIZE`` rows each.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import stats, tagging
+from .changelog import record_change, record_changes, record_deletions
+from .models import ArchivedComment, ArchivedPost, ChangeLog, Comment, Post, User
+
+
+def get_chunk_size():
+    return getattr(settings, 'PURGE_CHUNK_SIZE', 500)
+
+
+def soft_delete_user(user):
+    from .tasks import purge_user
+
+    now = timezone.now()
+    with transaction.atomic():
+        User.objects.filter(pk=user.pk).update(deleted_at=now, is_active=False)
+        Token.objects.filter(user=user).delete()
+        # Other users lose the comments they left on this user's posts
+        comment_deltas = _comment_counts_by_author(
+            Comment.objects.filter(post__author=user).exclude(author=user), sign=-1,
+        )
+        # Sync clients drop the hidden content now, not when the purge runs
+        record_deletions(ChangeLog.POST, Post.objects.filter(author=user))
+        record_deletions(ChangeLog.COMMENT, Comment.objects.filter(Q(author=user) | Q(post__author=user)))
+        Post.objects.filter(author=user).update(deleted_at=now)
+        Comment.objects.filter(author=user).update(deleted_at=now)
+        Comment.objects.filter(post__author=user).update(deleted_at=now)
+        stats.adjust_many('comment_count', comment_deltas)
+        purge_user.delay(user.pk)
+
+
+def soft_delete_post(post):
+    from .tasks import purge_post
+
+    now = timezone.now()
+    with transaction.atomic():
+        like_count = post.likes.count()
+        comment_deltas = _comment_counts_by_author(Comment.objects.filter(post=post), sign=-1)
+        record_deletions(ChangeLog.COMMENT, Comment.objects.filter(post=post))
+        Post.objects.filter(pk=post.pk).update(deleted_at=now)
+        Comment.objects.filter(post=post).update(deleted_at=now)
+        stats.adjust(post.author_id, post_count=-1, likes_received=-like_count)
+        stats.adjust_many('comment_count', comment_deltas)
+        record_change(ChangeLog.POST, post.pk, ChangeLog.DELETE)
+        purge_post.delay(post.pk)
+
+
+def delete_archived_post(post):
+    """Delete an archived post and its comments right away; the archive has no soft deletes."""
+    with transaction.atomic():
+        comments = ArchivedComment.objects.filter(post=post)
+        comment_deltas = _comment_counts_by_author(comments, sign=-1)
+        comments.delete()
+        ArchivedPost.objects.filter(pk=post.pk).delete()
+        stats.adjust(post.author_id, post_count=-1, likes_received=-len(post.like_user_ids))
+        stats.adjust_many('comment_count', comment_deltas)
+        record_change(ChangeLog.POST, post.pk, ChangeLog.DELETE)
+
+
+def _comment_counts_by_author(comments, sign=1):
+    return {
+        author_id: sign * count
+        for author_id, count in comments.order_by().values('author_id').annotate(n=Count('id')).values_list('author_id', 'n')
+    }
+
+
+def delete_in_chunks(queryset, chunk_size=None, before_delete=None):
+    """Delete the rows of ``queryset`` in bounded transactions without the collector.
+
+    ``before_delete`` is called with each chunk's primary keys inside the
+    transaction, so dependent rows can be removed first. Returns the number
+    of rows deleted.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    model = queryset.model
+    total = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return total
+            if before_delete is not None:
+                before_delete(pks)
+            total += model._base_manager.filter(pk__in=pks)._raw_delete(model._base_manager.db)
+
+
+# The purges only remove soft-deleted rows, which were already tombstoned
+# for sync clients when they were hidden
+def _delete_post_dependents(post_pks):
+    tagging.delete_for_posts(post_pks)
+    Post.likes.through.objects.filter(post_id__in=post_pks)._raw_delete(Post.likes.through.objects.db)
+    Comment.all_objects.filter(post_id__in=post_pks)._raw_delete(Comment.all_objects.db)
+
+
+def _delete_comment_dependents(comment_pks):
+    tagging.delete_for_comments(comment_pks)
+
+
+def purge_post(post_id):
+    return delete_in_chunks(
+        Post.all_objects.filter(pk=post_id, deleted_at__isnull=False),
+        before_delete=_delete_post_dependents,
+    )
+
+
+def purge_user(user_id):
+    """Remove a soft-deleted user's content in chunks, then the user row itself."""
+    if not User.objects.filter(pk=user_id, deleted_at__isnull=False).exists():
+        return
+
+    delete_in_chunks(Post.all_objects.filter(author_id=user_id), before_delete=_delete_post_dependents)
+    delete_in_chunks(Comment.all_objects.filter(author_id=user_id), before_delete=_delete_comment_dependents)
+
+    def record_unlikes(like_pks):
+        post_ids = list(Post.likes.through.objects.filter(pk__in=like_pks).values_list('post_id', flat=True))
+        record_changes(ChangeLog.LIKE, post_ids, ChangeLog.DELETE, user_id=user_id)
+        stats.adjust_many('likes_received', {
+            author_id: -count for author_id, count in stats.post_author_counts(post_ids).items()
+        }, rebuild_missing=False)
+
+    delete_in_chunks(Post.likes.through.objects.filter(user_id=user_id), before_delete=record_unlikes)
+
+    def delete_archived_comments(archived_post_pks):
+        ArchivedComment.objects.filter(post_id__in=archived_post_pks)._raw_delete(ArchivedComment.objects.db)
+
+    delete_in_chunks(ArchivedPost.objects.filter(author_id=user_id), before_delete=delete_archived_comments)
+    delete_in_chunks(ArchivedComment.objects.filter(author_id=user_id))
+
+    # Only a handful of rows (tokens, social accounts, ...) still point at the user
+    User.objects.filter(pk=user_id).delete()
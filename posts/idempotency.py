@@ -0,0 +1,146 @@
+"""``Idempotency-Key`` support for retry-safe writes.
+
+A client that may retry a write sends a unique ``Idempotency-Key`` header.
+The first response for a (user, method, path, key) is kept in the
+``IdempotencyKey`` table for ``IDEMPOTENCY_KEY_TTL`` seconds and replayed
+verbatim, with a single indexed lookup, for every retry. The row is inserted
+before the first request runs, so the unique constraint is an atomic lock
+on every database backend: while the first request is still running,
+duplicates are turned away with 409. Reusing a key with a different body is
+a 422.
+
+Expired rows are deleted by the hourly purge of the ``run_tasks`` worker,
+which must run in every deployment, as it also executes the queued purges
+of deleted content. So that the table stays bounded even when no worker is
+running or the queue never drains, each process also deletes a batch of at
+most ``PURGE_BATCH_SIZE`` expired rows every ``PURGE_INTERVAL`` seconds
+after claiming a new key.
+"""
+import functools
+import hashlib
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+LOCK_TIMEOUT = 30  # Seconds after which an unfinished request's lock is taken over
+MAX_KEY_LENGTH = 255
+PURGE_INTERVAL = 300  # Seconds between the purges done by request handling
+PURGE_BATCH_SIZE = 1000
+
+_next_purge = 0.0
+
+
+def get_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60)
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = dict(data.lists())
+    payload = json.dumps(data, sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def _replay(record, fingerprint):
+    if record.fingerprint != fingerprint:
+        return Response(
+            {"error": "This Idempotency-Key was already used with a different request body."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def _in_progress():
+    return Response(
+        {"error": "A request with this Idempotency-Key is already in progress."},
+        status=status.HTTP_409_CONFLICT,
+    )
+
+
+def _claim(key, fingerprint):
+    """Insert the lock row for ``key``; return it, or the earlier record if there is one."""
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            record = IdempotencyKey.objects.create(key=key, fingerprint=fingerprint, created_at=now)
+    except IntegrityError:
+        pass
+    else:
+        _purge_if_due()
+        return True, record
+
+    record = IdempotencyKey.objects.filter(key=key).first()
+    if record is None:
+        # The first request just failed and released its lock
+        return False, None
+    if record.status_code is not None and record.created_at > now - timedelta(seconds=get_ttl()):
+        return False, record
+    if record.status_code is None and record.created_at > now - timedelta(seconds=LOCK_TIMEOUT):
+        return False, None
+    # An expired response or an abandoned lock: take the row over, unless
+    # another duplicate got there first
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, created_at=record.created_at, status_code=record.status_code,
+    ).update(fingerprint=fingerprint, status_code=None, response=None, created_at=now)
+    if not taken:
+        return False, None
+    record.fingerprint, record.status_code, record.response, record.created_at = fingerprint, None, None, now
+    return True, record
+
+
+def purge_expired_keys(limit=None):
+    """Delete stored responses older than ``IDEMPOTENCY_KEY_TTL``, at most ``limit`` of them."""
+    cutoff = timezone.now() - timedelta(seconds=get_ttl())
+    expired = IdempotencyKey.objects.filter(created_at__lt=cutoff)
+    if limit is not None:
+        expired = IdempotencyKey.objects.filter(pk__in=list(expired.values_list('pk', flat=True)[:limit]))
+    deleted, _ = expired.delete()
+    return deleted
+
+
+def _purge_if_due():
+    global _next_purge
+    if time.monotonic() < _next_purge:
+        return
+    _next_purge = time.monotonic() + PURGE_INTERVAL
+    purge_expired_keys(limit=PURGE_BATCH_SIZE)
+
+
+def idempotent(method):
+    """Decorate a view handler so requests carrying an Idempotency-Key run once."""
+    @functools.wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({"error": "Idempotency-Key is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        scope = f"{request.user.pk}:{request.method}:{request.path}:{key}"
+        fingerprint = _fingerprint(request)
+        claimed, record = _claim(hashlib.sha256(scope.encode()).hexdigest(), fingerprint)
+        if not claimed:
+            return _replay(record, fingerprint) if record is not None else _in_progress()
+
+        try:
+            response = method(self, request, *args, **kwargs)
+        except BaseException:
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+            raise
+        # Server errors are not stored, so a retry gets another chance
+        if response.status_code < 500:
+            IdempotencyKey.objects.filter(pk=record.pk).update(status_code=response.status_code, response=response.data)
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).delete()
+        return response
+
+    return wrapper
@@ -0,0 +1,69 @@
+"""Compatibility endpoints for the retired ``connectly_project/posts`` app.
+
+The old app kept its own ``User`` table behind hand-written JSON views. These
+views keep its URLs and response bodies but run on the ``posts`` models and
+serializers, so there is a single user table. ``GET users/`` itself is
+served by ``UserListCreate``, which returns a superset of the old fields.
+"""
+from rest_framework import serializers, status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .deletion import soft_delete_user
+from .models import User
+from .permissions import may_manage_user
+from .serializers import UserSerializer
+
+
+class LegacyUserSerializer(UserSerializer):
+    # The old app had no passwords; such users get an unusable one
+    password = serializers.CharField(write_only=True, required=False)
+
+
+def _legacy_error(errors, code=status.HTTP_400_BAD_REQUEST):
+    return Response({'error': errors}, status=code)
+
+
+def _may_manage(request, user_id):
+    return may_manage_user(request.user, user_id)
+
+
+class LegacyUserCreate(APIView):
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = LegacyUserSerializer(data=request.data)
+        if not serializer.is_valid():
+            return _legacy_error(serializer.errors)
+        user = serializer.save()
+        return Response({'id': user.id, 'message': 'User created successfully'}, status=status.HTTP_201_CREATED)
+
+
+class LegacyUserUpdate(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, id):
+        if not _may_manage(request, id):
+            return _legacy_error('You do not have permission to update this user', status.HTTP_403_FORBIDDEN)
+        user = User.objects.filter(pk=id, deleted_at__isnull=True).first()
+        if user is None:
+            return _legacy_error('User not found', status.HTTP_404_NOT_FOUND)
+        serializer = LegacyUserSerializer(user, data={'email': request.data.get('email')}, partial=True)
+        if not serializer.is_valid():
+            return _legacy_error(serializer.errors)
+        serializer.save()
+        return Response({'message': 'User updated successfully'}, status=status.HTTP_201_CREATED)
+
+
+class LegacyUserDelete(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, id):
+        if not _may_manage(request, id):
+            return _legacy_error('You do not have permission to delete this user', status.HTTP_403_FORBIDDEN)
+        user = User.objects.filter(pk=id, deleted_at__isnull=True).first()
+        if user is None:
+            return _legacy_error('User not found', status.HTTP_404_NOT_FOUND)
+        soft_delete_user(user)
+        return Response({'message': 'User deleted successfully'}, status=status.HTTP_200_OK)
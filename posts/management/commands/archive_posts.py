@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts.archive import archive_cutoff, archive_posts
+
+
+class Command(BaseCommand):
+    help = "Move posts older than ARCHIVE_AFTER_DAYS, with their comments and likes, to the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help="Override ARCHIVE_AFTER_DAYS.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Posts moved per transaction.")
+
+    def handle(self, *args, **options):
+        cutoff = archive_cutoff(options['days'])
+        moved = archive_posts(cutoff, options['chunk_size'])
+        self.stdout.write(f"Archived {moved} posts created before {cutoff:%Y-%m-%d %H:%M}")
@@ -0,0 +1,62 @@
+import time
+import tracemalloc
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import deletion
+from posts.models import Comment, Post, User
+
+
+class Command(BaseCommand):
+    help = "Compare the cascading user delete with soft delete + chunked purge (time and peak memory)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=2000, help="Posts written by the deleted user.")
+        parser.add_argument('--comments', type=int, default=5, help="Comments per post.")
+        parser.add_argument('--likes', type=int, default=5, help="Likes per post.")
+
+    def handle(self, *args, **options):
+        # (label, untimed preparation, timed step)
+        runs = [
+            ("cascade delete", None, lambda user: user.delete()),
+            ("soft delete (request)", None, deletion.soft_delete_user),
+            ("purge (background)", deletion.soft_delete_user, lambda user: deletion.purge_user(user.pk)),
+        ]
+        for label, prepare, run in runs:
+            # Every run seeds its own data and rolls it back afterwards
+            with transaction.atomic():
+                user = self.seed(options['posts'], options['comments'], options['likes'])
+                if prepare is not None:
+                    prepare(user)
+                elapsed, peak = self.measure(run, user)
+                transaction.set_rollback(True)
+            self.stdout.write(f"{label:<24} {elapsed * 1000:10.1f} ms {peak / 1024 / 1024:10.2f} MiB peak")
+
+    def measure(self, run, user):
+        tracemalloc.start()
+        started = time.perf_counter()
+        run(user)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak
+
+    def seed(self, post_count, comments_per_post, likes_per_post):
+        tag = uuid.uuid4().hex[:8]
+        user = User.objects.create_user(username=f"bench-{tag}", email=f"bench-{tag}@example.com")
+        fans = User.objects.bulk_create([
+            User(username=f"bench-{tag}-{i}", email=f"bench-{tag}-{i}@example.com")
+            for i in range(max(comments_per_post, likes_per_post))
+        ])
+        posts = Post.objects.bulk_create([Post(author=user, content=f"Post {i}") for i in range(post_count)])
+        Comment.objects.bulk_create(
+            [Comment(author=fans[i], post=post, text="Nice") for post in posts for i in range(comments_per_post)],
+            batch_size=1000,
+        )
+        Post.likes.through.objects.bulk_create(
+            [Post.likes.through(post_id=post.pk, user_id=fans[i].pk) for post in posts for i in range(likes_per_post)],
+            batch_size=1000,
+        )
+        return user
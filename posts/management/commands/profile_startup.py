@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter so nothing is already imported
+BOOT_SCRIPT = """
+import resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - started
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(f"{elapsed:.6f} {rss} {len(sys.modules)}")
+"""
+
+
+class Command(BaseCommand):
+    help = "Boot the project in a fresh interpreter and report import time per module."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25, help="Number of modules to list.")
+        parser.add_argument('--sort', choices=['self', 'cumulative'], default='cumulative')
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'connectly_project.settings')}
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            capture_output=True, text=True, env=env,
+        )
+        if result.returncode != 0:
+            raise CommandError(result.stderr[-2000:])
+
+        modules = []
+        for line in result.stderr.splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+            modules.append((int(self_us), int(cumulative_us), name.strip()))
+
+        elapsed, max_rss, module_count = result.stdout.split()
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        rss_mib = int(max_rss) / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+        self.stdout.write(f"Boot time: {float(elapsed) * 1000:.1f} ms, peak RSS: {rss_mib:.1f} MiB, modules: {module_count}")
+
+        key = 0 if options['sort'] == 'self' else 1
+        self.stdout.write(f"{'self ms':>10} {'cumul ms':>10}  module")
+        for self_us, cumulative_us, name in sorted(modules, key=lambda row: row[key], reverse=True)[:options['top']]:
+            self.stdout.write(f"{self_us / 1000:10.1f} {cumulative_us / 1000:10.1f}  {name}")
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user profile stats rows from the post, comment and like tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help="Only rebuild these users (default: everyone).")
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Users recomputed per batch.")
+
+    def handle(self, *args, **options):
+        rebuilt = stats.rebuild(options['user_ids'] or None, chunk_size=options['chunk_size'])
+        self.stdout.write(f"Rebuilt stats for {rebuilt} users")
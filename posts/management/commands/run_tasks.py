@@ -0,0 +1,47 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.utils.module_loading import autodiscover_modules
+
+from posts import idempotency, taskqueue
+
+PURGE_INTERVAL = 3600  # Seconds between purges of finished tasks and expired idempotency keys
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks on a thread pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help="Number of worker threads.")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to sleep when the queue is empty.")
+        parser.add_argument('--once', action='store_true', help="Drain the currently due tasks and exit.")
+
+    def handle(self, *args, **options):
+        # Task functions live in each app's tasks.py and register on import
+        autodiscover_modules('tasks')
+
+        threads = options['threads']
+        next_purge = 0.0
+        self.stdout.write(f"Task worker started with {threads} threads")
+
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            try:
+                while True:
+                    # Checked before claiming, so a queue that never drains
+                    # still gets its old rows purged
+                    if time.monotonic() >= next_purge:
+                        taskqueue.purge_finished_tasks()
+                        idempotency.purge_expired_keys()
+                        next_purge = time.monotonic() + PURGE_INTERVAL
+
+                    claimed = taskqueue.claim_due_tasks(limit=threads * 2)
+                    if claimed:
+                        wait([executor.submit(taskqueue.run_task, pk) for pk in claimed])
+                        continue
+
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write("Task worker stopping")
@@ -0,0 +1,109 @@
+import gzip
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # Brotli support is optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # Zstandard support is optional
+    zstandard = None
+
+
+def _compress_gzip(content):
+    return gzip.compress(content, compresslevel=6, mtime=0)
+
+
+def _compress_brotli(content):
+    return brotli.compress(content, quality=5)
+
+
+def _compress_zstd(content):
+    return zstandard.ZstdCompressor(level=3).compress(content)
+
+
+# Server preference order; encodings whose library is missing are skipped
+CODECS = [
+    ('zstd', _compress_zstd if zstandard else None),
+    ('br', _compress_brotli if brotli else None),
+    ('gzip', _compress_gzip),
+]
+
+
+def parse_accept_encoding(header):
+    """Map each coding named in ``Accept-Encoding`` to its q-value.
+
+    Codings refused with ``q=0`` are kept, so a ``*`` elsewhere in the header
+    cannot bring them back.
+    """
+    qualities = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def accepted_encodings(header):
+    """Return the set of encodings the client accepts with a non-zero q-value."""
+    qualities = parse_accept_encoding(header)
+    accepted = {coding for coding, quality in qualities.items() if quality > 0}
+    if '*' in accepted:
+        # The wildcard only covers codings the header does not name
+        accepted.update(name for name, _ in CODECS if name not in qualities)
+    return accepted
+
+
+class CompressionMiddleware:
+    """Compress responses with the best encoding both sides support.
+
+    Bodies shorter than ``COMPRESSION_MIN_SIZE`` are sent as-is, since the
+    framing overhead outweighs the savings on small payloads.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 512)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < self.min_size:
+            return response
+
+        accepted = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        for name, compress in CODECS:
+            if compress is not None and name in accepted:
+                break
+        else:
+            return response
+
+        compressed = compress(response.content)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(compressed))
+        response.headers['Content-Encoding'] = name
+        # The body is no longer byte-identical to what a strong ETag promised
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        return response
@@ -1,10 +1,55 @@
 from django.contrib.auth.models import AbstractUser 
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
+
+class SoftDeleteQuerySet(models.QuerySet):
+    def live(self):
+        return self.filter(deleted_at__isnull=True)
+
+
+class LiveManager(models.Manager.from_queryset(SoftDeleteQuerySet)):
+    """Default manager that hides soft-deleted rows; use ``all_objects`` to see them."""
+
+    def get_queryset(self):
+        return super().get_queryset().live()
+
+
+class PostQuerySet(SoftDeleteQuerySet):
+    """Privacy and role rules as SQL predicates, so denied rows are never fetched."""
+
+    def visible_to(self, user):
+        return self.filter(models.Q(privacy='public') | models.Q(author_id=user.pk))
+
+    def editable_by(self, user):
+        if getattr(user, 'role', None) == 'admin':
+            return self
+        return self.filter(author_id=user.pk)
+
+    def deletable_by(self, user):
+        return self.editable_by(user)
+
+    def with_like_state(self, user):
+        """Annotate ``num_likes`` and ``liked_by_me`` for PostSerializer."""
+        return self.annotate(
+            num_likes=models.Count('likes'),
+            liked_by_me=models.Exists(
+                self.model.likes.through.objects.filter(post_id=models.OuterRef('pk'), user_id=user.pk)
+            ),
+        )
+
+
+class CommentQuerySet(SoftDeleteQuerySet):
+    def visible_to(self, user):
+        """Comments on posts the user may see."""
+        return self.filter(models.Q(post__privacy='public') | models.Q(post__author_id=user.pk))
+
 
 class User(AbstractUser ):
     email = models.EmailField(unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     role = models.CharField(max_length=10, choices=[('admin', 'Admin'), ('user', 'User '), ('guest', 'Guest')], default='user')
+    deleted_at = models.DateTimeField(null=True, blank=True)  # Set on soft delete, row is purged in the background
 
     REQUIRED_FIELDS = ['email']
 
@@ -18,6 +63,11 @@ class Post(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     likes = models.ManyToManyField(User, related_name='liked_posts', blank=True)
     privacy = models.CharField(max_length=10, choices=[('public', 'Public'), ('private', 'Private')], default='public')
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=1)  # Bumped by every edit, see versioning.py
+
+    objects = LiveManager.from_queryset(PostQuerySet)()
+    all_objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return f"Post by {self.author.username}"
@@ -28,6 +78,141 @@ class Comment(models.Model):
     author = models.ForeignKey(User, related_name='comments', on_delete=models.CASCADE)
     post = models.ForeignKey(Post, related_name='comments', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=1)
+
+    objects = LiveManager.from_queryset(CommentQuerySet)()
+    all_objects = CommentQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Comment by {self.author.username} on Post {self.post.id}"
+
+
+class Task(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    name = models.CharField(max_length=200)  # Dotted name of the registered task function
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=[(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')], default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)  # Next run time, or lease expiry while running
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_at'], name='posts_task_status_run_at_idx')]
+
+    def __str__(self):
+        return f"Task {self.name} ({self.status})"
+
+
+class ChangeLog(models.Model):
+    POST = 'post'
+    COMMENT = 'comment'
+    LIKE = 'like'
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+
+    # The auto-incrementing id doubles as the sync token handed to clients
+    entity = models.CharField(max_length=10, choices=[(POST, 'Post'), (COMMENT, 'Comment'), (LIKE, 'Like')])
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=10, choices=[(UPSERT, 'Upsert'), (DELETE, 'Delete')])
+    user_id = models.BigIntegerField(null=True, blank=True)  # Liking user; plain column so user purges don't cascade here
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.op} {self.entity} {self.object_id}"
+
+
+class ArchivedPost(models.Model):
+    # Archived rows keep the id they had in the hot table
+    id = models.BigIntegerField(primary_key=True)
+    content = models.TextField()
+    author = models.ForeignKey(User, related_name='archived_posts', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+    privacy = models.CharField(max_length=10, choices=[('public', 'Public'), ('private', 'Private')], default='public')
+    like_user_ids = models.JSONField(default=list)  # Likes are frozen with the post, so a list is enough
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived post by {self.author.username}"
+
+
+class ArchivedComment(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    text = models.TextField()
+    author = models.ForeignKey(User, related_name='archived_comments', on_delete=models.CASCADE)
+    post = models.ForeignKey(ArchivedPost, related_name='comments', on_delete=models.CASCADE)
+    created_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Archived comment by {self.author.username} on Post {self.post_id}"
+
+
+class UserStats(models.Model):
+    # Maintained incrementally by the write paths (see posts/stats.py)
+    user = models.OneToOneField(User, primary_key=True, related_name='stats', on_delete=models.CASCADE)
+    post_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)  # Comments written by the user
+    likes_received = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}"
+
+
+class Hashtag(models.Model):
+    name = models.CharField(max_length=100, unique=True)  # Lower-cased, without the leading '#'
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostTag(models.Model):
+    post = models.ForeignKey(Post, related_name='post_tags', on_delete=models.CASCADE)
+    tag = models.ForeignKey(Hashtag, related_name='post_tags', on_delete=models.CASCADE)
+
+    class Meta:
+        # Leading on tag, so it also serves the tags/<tag>/ lookup
+        constraints = [models.UniqueConstraint(fields=['tag', 'post'], name='posts_posttag_tag_post_uniq')]
+
+
+class Mention(models.Model):
+    user = models.ForeignKey(User, related_name='mentions', on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name='mentions', on_delete=models.CASCADE)  # For comments, the post commented on
+    comment = models.ForeignKey(Comment, related_name='mentions', null=True, blank=True, on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'post'], name='posts_mention_user_post_idx')]
+
+
+class TagCount(models.Model):
+    # Hourly usage counters behind the trending-tags endpoint
+    tag = models.ForeignKey(Hashtag, related_name='counts', on_delete=models.CASCADE)
+    bucket = models.DateTimeField()  # Start of the hour
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['bucket', 'tag'], name='posts_tagcount_bucket_tag_uniq')]
+
+
+class IdempotencyKey(models.Model):
+    # One row per Idempotency-Key; the unique insert doubles as the lock
+    key = models.CharField(max_length=64, unique=True)  # sha256 of user, method, path and client key
+    fingerprint = models.CharField(max_length=16)  # Hash of the request body
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # None while the first request runs
+    response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at'], name='posts_idemkey_created_at_idx')]
 
     def __str__(self):
-        return f"Comment by {self.author.username} on Post {self.post.id}"
\ No newline at end of file
+        return f"Idempotency key {self.key[:12]}"
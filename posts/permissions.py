@@ -0,0 +1,14 @@
+from rest_framework import permissions
+
+
+def may_manage_user(user, user_id):
+    """Accounts may only be changed by their owner or an admin."""
+    return user.pk == user_id or getattr(user, 'role', None) == 'admin'
+
+
+class IsAccountOwnerOrAdmin(permissions.BasePermission):
+    """Anyone signed in may read an account; only its owner or an admin may change it."""
+    message = "You do not have permission to change this user."
+
+    def has_object_permission(self, request, view, obj):
+        return request.method in permissions.SAFE_METHODS or may_manage_user(request.user, obj.pk)
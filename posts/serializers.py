@@ -1,5 +1,41 @@
 from rest_framework import serializers
-from .models import User, Post, Comment
+from .models import User, Post, Comment, ArchivedPost, ArchivedComment, UserStats
+
+
+def parse_field_list(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fields(request):
+    """Return the ``?fields=`` and ``?expand=`` sets for a read request."""
+    if request is None or request.method != 'GET':
+        return set(), set()
+    return parse_field_list(request.query_params.get('fields')), parse_field_list(request.query_params.get('expand'))
+
+
+class ShapedFieldsMixin:
+    """Drop fields the client did not ask for.
+
+    ``?fields=a,b`` keeps only the listed fields. Fields named in the
+    ``collapsed_fields`` context entry are left out unless they appear in
+    ``?expand=`` (or ``?fields=``). Only GET requests are shaped so writes
+    always validate the full field set. Unknown field names are a 400.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expand = requested_fields(self.context.get('request'))
+        unknown = fields - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'error': (
+                f"Unknown fields: {', '.join(sorted(unknown))}. Valid fields: {', '.join(self.fields)}."
+            )})
+        if fields:
+            for name in set(self.fields) - fields:
+                self.fields.pop(name)
+        for name in self.context.get('collapsed_fields', ()):
+            if name not in expand and name not in fields:
+                self.fields.pop(name, None)
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -12,27 +48,83 @@ class UserSerializer(serializers.ModelSerializer):
         return User.objects.create_user(**validated_data)
 
 
+class UserProfileSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='user_id', read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+    created_at = serializers.DateTimeField(source='user.created_at', read_only=True)
+
+    class Meta:
+        model = UserStats
+        fields = ['id', 'username', 'created_at', 'post_count', 'comment_count', 'likes_received']
+
+
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
 
     class Meta:
         model = Comment
-        fields = ['id', 'text', 'author', 'post', 'created_at']
+        fields = ['id', 'text', 'author', 'post', 'created_at', 'version']
+        read_only_fields = ['version']
 
     def validate_post(self, value):
-        if not Post.objects.filter(id=value.id).exists():
+        request = self.context.get('request')
+        posts = Post.objects.visible_to(request.user) if request is not None else Post.objects.all()
+        if not posts.filter(id=value.id).exists():
             raise serializers.ValidationError("Post not found.")
         return value
 
 
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(ShapedFieldsMixin, serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
     comments = CommentSerializer(many=True, read_only=True)
     likes_count = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ['id', 'content', 'author', 'created_at', 'comments', 'likes_count', 'privacy']
+        fields = ['id', 'content', 'author', 'created_at', 'comments', 'likes_count', 'is_liked', 'privacy', 'version']
+        read_only_fields = ['version']
 
     def get_likes_count(self, obj):
-        return obj.likes.count()
\ No newline at end of file
+        # Feed querysets annotate the count to avoid a query per row
+        if hasattr(obj, 'num_likes'):
+            return obj.num_likes
+        return obj.likes.count()
+
+    def get_is_liked(self, obj):
+        # Feed querysets annotate an EXISTS subquery for the whole page
+        if hasattr(obj, 'liked_by_me'):
+            return obj.liked_by_me
+        request = self.context.get('request')
+        if request is None or not request.user.is_authenticated:
+            return False
+        return obj.likes.filter(pk=request.user.pk).exists()
+
+
+class ArchivedCommentSerializer(serializers.ModelSerializer):
+    author = serializers.StringRelatedField(read_only=True)
+    post = serializers.IntegerField(source='post_id', read_only=True)
+
+    class Meta:
+        model = ArchivedComment
+        fields = ['id', 'text', 'author', 'post', 'created_at']
+
+
+class ArchivedPostSerializer(ShapedFieldsMixin, serializers.ModelSerializer):
+    """Read-only twin of PostSerializer, so archived posts look the same to clients."""
+    author = serializers.StringRelatedField(read_only=True)
+    comments = ArchivedCommentSerializer(many=True, read_only=True)
+    likes_count = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ArchivedPost
+        fields = ['id', 'content', 'author', 'created_at', 'comments', 'likes_count', 'is_liked', 'privacy']
+        read_only_fields = fields
+
+    def get_likes_count(self, obj):
+        return len(obj.like_user_ids)
+
+    def get_is_liked(self, obj):
+        request = self.context.get('request')
+        return request is not None and request.user.pk in obj.like_user_ids
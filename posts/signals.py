@@ -0,0 +1,77 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import stats
+from .changelog import record_change, record_changes
+from .models import ChangeLog, Comment, Post, User, UserStats
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def log_post_save(sender, instance, created, **kwargs):
+    record_change(ChangeLog.POST, instance.pk)
+    if created:
+        stats.adjust(instance.author_id, post_count=1)
+
+
+@receiver(pre_delete, sender=Post)
+def count_post_delete(sender, instance, **kwargs):
+    # Soft-deleted posts were already taken off the counters; likes are
+    # still there to count because the collector signals before deleting
+    if instance.deleted_at is None:
+        stats.adjust(
+            instance.author_id, rebuild_missing=False, post_count=-1, likes_received=-instance.likes.count(),
+        )
+
+
+@receiver(post_delete, sender=Post)
+def log_post_delete(sender, instance, **kwargs):
+    record_change(ChangeLog.POST, instance.pk, ChangeLog.DELETE)
+
+
+@receiver(post_save, sender=Comment)
+def log_comment_save(sender, instance, created, **kwargs):
+    record_change(ChangeLog.COMMENT, instance.pk)
+    if created:
+        stats.adjust(instance.author_id, comment_count=1)
+
+
+@receiver(post_delete, sender=Comment)
+def log_comment_delete(sender, instance, **kwargs):
+    record_change(ChangeLog.COMMENT, instance.pk, ChangeLog.DELETE)
+    if instance.deleted_at is None:
+        stats.adjust(instance.author_id, comment_count=-1)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def log_like_toggle(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_remove', 'pre_clear'):
+        # pk_set is empty for clears and lists every requested id for
+        # removes, liked or not, so remember which likes really go away
+        related = instance.liked_posts if reverse else instance.likes
+        if action == 'pre_remove':
+            related = related.filter(pk__in=pk_set)
+        instance._removed_like_pks = set(related.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    op = ChangeLog.UPSERT if action == 'post_add' else ChangeLog.DELETE
+    sign = 1 if action == 'post_add' else -1
+    if action in ('post_remove', 'post_clear'):
+        pk_set = getattr(instance, '_removed_like_pks', set())
+    if reverse:
+        # user.liked_posts.add(...): pk_set holds post ids
+        record_changes(ChangeLog.LIKE, pk_set, op, user_id=instance.pk)
+        stats.adjust_many('likes_received', {
+            author_id: sign * count for author_id, count in stats.post_author_counts(pk_set).items()
+        })
+    else:
+        for user_id in pk_set:
+            record_change(ChangeLog.LIKE, instance.pk, op, user_id=user_id)
+        stats.adjust(instance.author_id, likes_received=sign * len(pk_set))
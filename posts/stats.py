@@ -0,0 +1,84 @@
+"""Per-user profile counters kept in ``UserStats``.
+
+Post, comment and like writes adjust the counters with ``F()`` updates in
+the same transaction as the write itself, so the profile endpoint is a
+single primary-key lookup. Archived content still counts towards a profile.
+``rebuild`` recomputes rows from the source tables; it backs the
+``rebuild_user_stats`` command and fills in rows missing for older users.
+"""
+from collections import Counter, defaultdict
+
+from django.db.models import Count, F
+
+from .models import ArchivedComment, ArchivedPost, Comment, Post, User, UserStats
+
+FIELDS = ('post_count', 'comment_count', 'likes_received')
+
+
+def adjust(user_id, rebuild_missing=True, **deltas):
+    """Add ``deltas`` to a user's counters with a single UPDATE.
+
+    Call this after the write it accounts for: a user without a stats row
+    gets one computed from the tables, which then already reflects the write.
+    Callers that run before their write pass ``rebuild_missing=False`` and
+    leave the row to be built on first read.
+    """
+    updates = {name: F(name) + delta for name, delta in deltas.items() if delta}
+    if not updates:
+        return
+    if not UserStats.objects.filter(user_id=user_id).update(**updates) and rebuild_missing:
+        rebuild([user_id])
+
+
+def adjust_many(field, deltas, rebuild_missing=True):
+    """Apply a ``{user_id: delta}`` mapping to one counter."""
+    for user_id, delta in deltas.items():
+        adjust(user_id, rebuild_missing, **{field: delta})
+
+
+def post_author_counts(post_ids):
+    """Map authors to how many of the live ``post_ids`` they wrote."""
+    if not post_ids:
+        return Counter()
+    return Counter(Post.objects.filter(pk__in=post_ids).values_list('author_id', flat=True))
+
+
+def compute(user_ids):
+    stats = {pk: dict.fromkeys(FIELDS, 0) for pk in user_ids}
+
+    def add(field, rows):
+        for user_id, count in rows:
+            stats[user_id][field] += count
+
+    add('post_count', Post.objects.filter(author_id__in=user_ids).values('author_id').annotate(n=Count('id')).values_list('author_id', 'n'))
+    add('comment_count', Comment.objects.filter(author_id__in=user_ids).values('author_id').annotate(n=Count('id')).values_list('author_id', 'n'))
+    add('likes_received', (
+        Post.likes.through.objects.filter(post__author_id__in=user_ids, post__deleted_at__isnull=True)
+        .values('post__author_id').annotate(n=Count('id')).values_list('post__author_id', 'n')
+    ))
+    add('comment_count', ArchivedComment.objects.filter(author_id__in=user_ids).values('author_id').annotate(n=Count('id')).values_list('author_id', 'n'))
+    archived_likes = defaultdict(int)
+    for author_id, like_user_ids in ArchivedPost.objects.filter(author_id__in=user_ids).values_list('author_id', 'like_user_ids').iterator():
+        stats[author_id]['post_count'] += 1
+        archived_likes[author_id] += len(like_user_ids)
+    add('likes_received', archived_likes.items())
+    return stats
+
+
+def rebuild(user_ids=None, chunk_size=1000):
+    """Recompute the stats rows of ``user_ids`` (every live user by default)."""
+    if user_ids is None:
+        user_ids = User.objects.filter(deleted_at__isnull=True).order_by('pk').values_list('pk', flat=True).iterator()
+    user_ids = iter(user_ids)
+    rebuilt = 0
+    while True:
+        chunk = [pk for _, pk in zip(range(chunk_size), user_ids)]
+        if not chunk:
+            return rebuilt
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk, **counters) for pk, counters in compute(chunk).items()],
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=list(FIELDS) + ['updated_at'],
+        )
+        rebuilt += len(chunk)
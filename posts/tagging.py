@@ -0,0 +1,152 @@
+"""Hashtag and @mention extraction, done once at write time.
+
+Tags and mentions are parsed from ``Post.content`` and ``Comment.text`` when
+they are created or edited and stored in ``PostTag``/``Mention``, so lookups
+by tag or mentioned user are indexed joins instead of text scans. Every new
+tag use on a public post also bumps an hourly ``TagCount`` bucket, which the
+trending endpoint sums over a sliding window.
+"""
+import re
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Comment, Hashtag, Mention, Post, PostTag, TagCount, User
+
+HASHTAG_RE = re.compile(r'(?<![\w&])#(\w{1,100})')
+MENTION_RE = re.compile(r'(?<![\w@])@([\w.+-]{1,150})')
+TAG_COUNT_RETENTION = timedelta(days=7)
+
+
+def extract_hashtags(text):
+    return {tag.lower() for tag in HASHTAG_RE.findall(text or '')}
+
+
+def extract_mentions(text):
+    # A trailing dot is punctuation ("thanks @bob."), not part of the username
+    return {name.rstrip('.') for name in MENTION_RE.findall(text or '') if name.rstrip('.')}
+
+
+def _get_tags(names):
+    if not names:
+        return {}
+    existing = dict(Hashtag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = [Hashtag(name=name) for name in names if name not in existing]
+    if missing:
+        Hashtag.objects.bulk_create(missing, ignore_conflicts=True)
+        existing = dict(Hashtag.objects.filter(name__in=names).values_list('name', 'pk'))
+    return existing
+
+
+def _count_tag_uses(tag_ids):
+    bucket = timezone.now().replace(minute=0, second=0, microsecond=0)
+    for tag_id in tag_ids:
+        if TagCount.objects.filter(tag_id=tag_id, bucket=bucket).update(count=F('count') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                TagCount.objects.create(tag_id=tag_id, bucket=bucket, count=1)
+        except IntegrityError:
+            TagCount.objects.filter(tag_id=tag_id, bucket=bucket).update(count=F('count') + 1)
+        else:
+            # First use of this tag this hour: a cheap moment to drop old buckets
+            TagCount.objects.filter(bucket__lt=bucket - TAG_COUNT_RETENTION).delete()
+
+
+def _mention_rows(sources):
+    """Build Mention rows for ``(text, post_id, comment_id)`` triples with one user lookup."""
+    names = {source: extract_mentions(source[0]) for source in sources}
+    wanted = set().union(*names.values())
+    if not wanted:
+        return []
+    users = dict(User.objects.filter(username__in=wanted, deleted_at__isnull=True).values_list('username', 'pk'))
+    return [
+        Mention(user_id=users[name], post_id=post_id, comment_id=comment_id)
+        for (_, post_id, comment_id), mentioned in names.items()
+        for name in mentioned if name in users
+    ]
+
+
+def _index_mentions(text, post_id, comment_id=None):
+    Mention.objects.bulk_create(_mention_rows([(text, post_id, comment_id)]))
+
+
+def index_post(post):
+    """(Re)build the tag and mention rows of a post after it was saved."""
+    names = extract_hashtags(post.content)
+    current = set(PostTag.objects.filter(post=post).values_list('tag__name', flat=True))
+    if current - names:
+        PostTag.objects.filter(post=post, tag__name__in=current - names).delete()
+    added = names - current
+    if added:
+        tags = _get_tags(added)
+        PostTag.objects.bulk_create([PostTag(post=post, tag_id=pk) for pk in tags.values()])
+        if post.privacy == 'public':
+            _count_tag_uses(tags.values())
+
+    Mention.objects.filter(post=post, comment__isnull=True).delete()
+    _index_mentions(post.content, post.pk)
+
+
+def index_comment(comment):
+    Mention.objects.filter(comment=comment).delete()
+    _index_mentions(comment.text, comment.post_id, comment.pk)
+
+
+def _keyset_chunks(queryset, chunk_size):
+    last_pk = 0
+    while True:
+        rows = list(queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size])
+        if not rows:
+            return
+        yield rows
+        last_pk = rows[-1][0]
+
+
+def reindex(chunk_size=1000):
+    """Rebuild the tag and mention rows of every live post and comment.
+
+    Backs ``import_connectly``, whose bulk inserts skip the write-time
+    indexing. Trending counters are left alone, as imported posts are not
+    new uses. Returns the number of posts indexed.
+    """
+    indexed = 0
+    for posts in _keyset_chunks(Post.objects.values_list('pk', 'content'), chunk_size):
+        post_ids = [pk for pk, _ in posts]
+        with transaction.atomic():
+            delete_for_posts(post_ids)
+            names = {pk: extract_hashtags(content) for pk, content in posts}
+            tags = _get_tags(set().union(*names.values()))
+            PostTag.objects.bulk_create([
+                PostTag(post_id=pk, tag_id=tags[name]) for pk, post_names in names.items() for name in post_names
+            ])
+            Mention.objects.bulk_create(_mention_rows([(content, pk, None) for pk, content in posts]))
+        indexed += len(posts)
+
+    # Comment mentions were dropped along with their posts' rows above
+    for comments in _keyset_chunks(Comment.objects.values_list('pk', 'text', 'post_id'), chunk_size):
+        Mention.objects.bulk_create(_mention_rows([(text, post_id, pk) for pk, text, post_id in comments]))
+    return indexed
+
+
+def trending_tags(hours=24, limit=10):
+    since = timezone.now() - timedelta(hours=hours)
+    return list(
+        TagCount.objects.filter(bucket__gte=since)
+        .values('tag__name')
+        .annotate(uses=Sum('count'))
+        .order_by('-uses', 'tag__name')
+        .values_list('tag__name', 'uses')[:limit]
+    )
+
+
+def delete_for_posts(post_ids):
+    """Drop index rows before posts are removed with raw deletes."""
+    PostTag.objects.filter(post_id__in=post_ids)._raw_delete(PostTag.objects.db)
+    Mention.objects.filter(post_id__in=post_ids)._raw_delete(Mention.objects.db)
+
+
+def delete_for_comments(comment_ids):
+    Mention.objects.filter(comment_id__in=comment_ids)._raw_delete(Mention.objects.db)
@@ -0,0 +1,148 @@
+"""Lightweight DB-backed task queue for write side effects.
+
+Tasks are plain functions registered with ``@task``. ``enqueue`` stores a
+``Task`` row inside the caller's transaction, so a task only becomes visible
+to workers once the write that produced it has committed. The ``run_tasks``
+management command claims due rows and runs them on a thread pool.
+
+With ``TASK_QUEUE['EAGER']`` set, tasks run inline instead; tests use this.
+"""
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'EAGER': False,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_BACKOFF': 10,  # Seconds; doubled after every failed attempt
+    'LEASE_SECONDS': 300,  # A running task whose lease expires is picked up again
+    'RETENTION_SECONDS': 24 * 60 * 60,  # Finished rows are kept this long for idempotency
+}
+
+_registry = {}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TASK_QUEUE', {})}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Register ``func`` as a task and give it a ``delay`` shortcut."""
+    def decorator(fn):
+        fn.task_name = name or f"{fn.__module__}.{fn.__name__}"
+        fn.max_attempts = max_attempts
+        fn.delay = lambda *args, **kwargs: enqueue(fn, *args, **kwargs)
+        _registry[fn.task_name] = fn
+        return fn
+
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def enqueue(func, *args, idempotency_key=None, countdown=0, **kwargs):
+    """Queue ``func(*args, **kwargs)``; arguments must be JSON serializable.
+
+    A second call with the same ``idempotency_key`` is a no-op for as long as
+    the first task row is retained. Returns the ``Task`` row, or ``None`` when
+    the task ran eagerly or was deduplicated.
+    """
+    config = get_config()
+    if isinstance(func, str):
+        func = _registry[func]
+
+    if config['EAGER']:
+        func(*args, **kwargs)
+        return None
+
+    try:
+        with transaction.atomic():
+            return Task.objects.create(
+                name=func.task_name,
+                args=list(args),
+                kwargs=kwargs,
+                idempotency_key=idempotency_key,
+                max_attempts=func.max_attempts or config['MAX_ATTEMPTS'],
+                run_at=timezone.now() + timedelta(seconds=countdown),
+            )
+    except IntegrityError:
+        if idempotency_key is None:
+            raise
+        logger.debug("Task %s with key %s already queued", func.task_name, idempotency_key)
+        return None
+
+
+def claim_due_tasks(limit):
+    """Atomically lease up to ``limit`` due tasks and return their ids.
+
+    Each claim is a conditional UPDATE on the attempt counter, so several
+    worker processes can poll the same table without running a task twice.
+    """
+    config = get_config()
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=config['LEASE_SECONDS'])
+    candidates = (
+        Task.objects
+        .filter(Q(status=Task.PENDING) | Q(status=Task.RUNNING), run_at__lte=now)
+        .order_by('run_at')
+        .values_list('pk', 'status', 'attempts')[:limit]
+    )
+
+    claimed = []
+    for pk, status, attempts in candidates:
+        updated = Task.objects.filter(pk=pk, status=status, attempts=attempts).update(
+            status=Task.RUNNING,
+            attempts=F('attempts') + 1,
+            run_at=lease_until,
+        )
+        if updated:
+            claimed.append(pk)
+    return claimed
+
+
+def run_task(pk):
+    """Run a claimed task and record the outcome, scheduling a retry on failure."""
+    close_old_connections()
+    try:
+        task_row = Task.objects.get(pk=pk)
+        func = _registry.get(task_row.name)
+        if func is None:
+            Task.objects.filter(pk=pk).update(status=Task.FAILED, last_error=f"Unknown task {task_row.name}")
+            logger.error("Unknown task %s", task_row.name)
+            return
+
+        try:
+            func(*task_row.args, **task_row.kwargs)
+        except Exception:
+            error = traceback.format_exc()
+            if task_row.attempts >= task_row.max_attempts:
+                Task.objects.filter(pk=pk).update(status=Task.FAILED, last_error=error)
+                logger.error("Task %s failed permanently:\n%s", task_row.name, error)
+            else:
+                delay = get_config()['RETRY_BACKOFF'] * 2 ** (task_row.attempts - 1)
+                Task.objects.filter(pk=pk).update(
+                    status=Task.PENDING,
+                    last_error=error,
+                    run_at=timezone.now() + timedelta(seconds=delay),
+                )
+                logger.warning("Task %s failed, retrying in %ss", task_row.name, delay)
+        else:
+            Task.objects.filter(pk=pk).update(status=Task.DONE, last_error='')
+    finally:
+        close_old_connections()
+
+
+def purge_finished_tasks():
+    """Delete finished task rows older than the retention window."""
+    cutoff = timezone.now() - timedelta(seconds=get_config()['RETENTION_SECONDS'])
+    deleted, _ = Task.objects.filter(status__in=[Task.DONE, Task.FAILED], updated_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,12 @@
+from . import deletion
+from .taskqueue import task
+
+
+@task
+def purge_user(user_id):
+    deletion.purge_user(user_id)
+
+
+@task
+def purge_post(post_id):
+    deletion.purge_post(post_id)
@@ -1,3 +1,768 @@
-from django.test import TestCase
+import fcntl
+import gzip
+import io
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import idempotency, tagging, taskqueue
+from .changelog import build_sync_payload, latest_token
+from .deletion import purge_post, soft_delete_post, soft_delete_user
+from .middleware import CODECS, CompressionMiddleware, accepted_encodings
+from .archive import archive_posts
+from .models import ArchivedComment, ArchivedPost, ChangeLog, Comment, IdempotencyKey, Mention, Post, PostTag, Task, User, UserStats
+
+
+class LockedFileCache(FileBasedCache):
+    """A file cache with an atomic ``incr``, standing in for Redis across forked processes."""
+
+    def incr(self, key, delta=1, version=None):
+        with open(os.path.join(self._dir, 'incr.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            return super().incr(key, delta, version)
+
+
+def _tiered_cache_settings(location, epoch_interval, l2_backend='posts.tests.LockedFileCache'):
+    return {
+        'default': {
+            'BACKEND': 'posts.cache.TieredCache',
+            'LOCATION': 'test',
+            'OPTIONS': {'L2': 'shared', 'L1_TIMEOUT': 60, 'EPOCH_CHECK_INTERVAL': epoch_interval},
+        },
+        'shared': {
+            'BACKEND': l2_backend,
+            'LOCATION': location,
+        },
+    }
+
+
+def _fresh_cache():
+    # A forked child starts with a copy of the parent's L1; empty it so
+    # reads have to go through the shared tier first
+    cache = caches['default']
+    cache.l1.clear()
+    return cache
+
+
+def _read_repeatedly(key, reads, results):
+    cache = _fresh_cache()
+    values = {cache.get(key) for _ in range(reads)}
+    results.put((values, cache.stats()))
+
+
+def _read_before_and_after(key, other_key, ready, written, results):
+    cache = _fresh_cache()
+    before = cache.get(key)
+    cache.get(other_key)
+    ready.set()
+    written.wait(10)
+    after = cache.get(key)
+    l1_hits = cache.l1_hits
+    cache.get(other_key)
+    results.put((before, after, cache.l1_hits - l1_hits))
+
+
+class TieredCacheMultiProcessTests(SimpleTestCase):
+    """Each worker is a forked process with its own L1, sharing one file-backed L2."""
+
+    processes = 4
+
+    def setUp(self):
+        self.context = multiprocessing.get_context('fork')
+        self.location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.location, ignore_errors=True)
+
+    def test_l1_serves_repeated_reads(self):
+        with override_settings(CACHES=_tiered_cache_settings(self.location, epoch_interval=60)):
+            caches['default'].set('greeting', 'hello')
+            results = self.context.Queue()
+            workers = [
+                self.context.Process(target=_read_repeatedly, args=('greeting', 100, results))
+                for _ in range(self.processes)
+            ]
+            for worker in workers:
+                worker.start()
+            outcomes = [results.get(timeout=10) for _ in workers]
+            for worker in workers:
+                worker.join()
+
+        for values, stats in outcomes:
+            self.assertEqual(values, {'hello'})
+            self.assertEqual(stats['misses'], 0)
+            self.assertEqual(stats['l2_hits'], 1)
+            self.assertEqual(stats['l1_hits'], 99)
+            self.assertEqual(stats['hit_rate'], 1.0)
+
+    def _write_while_workers_read(self, **settings):
+        with override_settings(CACHES=_tiered_cache_settings(self.location, epoch_interval=0, **settings)):
+            caches['default'].set('greeting', 'hello')
+            caches['default'].set('farewell', 'bye')
+            results = self.context.Queue()
+            workers = []
+            for _ in range(self.processes):
+                ready, written = self.context.Event(), self.context.Event()
+                worker = self.context.Process(target=_read_before_and_after, args=('greeting', 'farewell', ready, written, results))
+                worker.start()
+                workers.append((worker, ready, written))
+
+            for _, ready, _ in workers:
+                self.assertTrue(ready.wait(10))
+            # Every worker now holds the old value in its L1
+            caches['default'].set('greeting', 'goodbye')
+            for _, _, written in workers:
+                written.set()
+            outcomes = [results.get(timeout=10) for _ in workers]
+            for worker, _, _ in workers:
+                worker.join()
+        return outcomes
+
+    def test_writes_invalidate_other_processes(self):
+        # Only the written key was invalidated; the other one stayed in L1
+        self.assertEqual(self._write_while_workers_read(), [('hello', 'goodbye', 1)] * self.processes)
+
+    def test_l2_without_atomic_incr_drops_whole_l1(self):
+        outcomes = self._write_while_workers_read(
+            l2_backend='django.core.cache.backends.filebased.FileBasedCache',
+        )
+        self.assertEqual(outcomes, [('hello', 'goodbye', 0)] * self.processes)
+
+
+class CompressionMiddlewareTests(SimpleTestCase):
+    """Accept-Encoding negotiation and what compression does to the headers."""
+
+    body = b'{"content": "' + b'compressible ' * 100 + b'"}'
+
+    def respond(self, accept_encoding, body=None, etag=None):
+        def get_response(request):
+            response = HttpResponse(self.body if body is None else body, content_type='application/json')
+            if etag:
+                response['ETag'] = etag
+            return response
+
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding)
+        return CompressionMiddleware(get_response)(request)
+
+    def test_negotiation(self):
+        others = {name for name, _ in CODECS if name != 'gzip'}
+        self.assertEqual(accepted_encodings('gzip;q=0, *'), {'*'} | others)
+        self.assertEqual(accepted_encodings('GZIP;q=0.5, identity'), {'gzip', 'identity'})
+        self.assertEqual(accepted_encodings('*;q=0'), set())
+
+        best = next(name for name, compress in CODECS if compress is not None)
+        self.assertEqual(self.respond('gzip')['Content-Encoding'], 'gzip')
+        self.assertEqual(self.respond('*')['Content-Encoding'], best)
+        self.assertNotEqual(self.respond('gzip;q=0, *').get('Content-Encoding'), 'gzip')
+        self.assertFalse(self.respond('identity').has_header('Content-Encoding'))
+
+    def test_gzip_body_round_trips(self):
+        response = self.respond('gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+
+    def test_small_bodies_are_sent_as_is(self):
+        response = self.respond('gzip', body=b'{}')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'{}')
+
+    def test_vary_is_set_with_or_without_compression(self):
+        self.assertIn('Accept-Encoding', self.respond('gzip')['Vary'])
+        self.assertIn('Accept-Encoding', self.respond('identity')['Vary'])
+        self.assertIn('Accept-Encoding', self.respond('gzip', body=b'{}')['Vary'])
+
+    def test_compressed_responses_weaken_strong_etags(self):
+        self.assertEqual(self.respond('gzip', etag='"v3"')['ETag'], 'W/"v3"')
+        self.assertEqual(self.respond('gzip', etag='W/"v3"')['ETag'], 'W/"v3"')
+        self.assertEqual(self.respond('identity', etag='"v3"')['ETag'], '"v3"')
+
+
+_task_calls = []
+
+
+@taskqueue.task(name='posts.tests.record_call')
+def _record_call(value):
+    _task_calls.append(value)
+
+
+@taskqueue.task(name='posts.tests.always_fail', max_attempts=2)
+def _always_fail():
+    raise RuntimeError("boom")
+
+
+class PostVisibilityTests(TestCase):
+    """Privacy rules are SQL predicates: denied posts cost no extra row fetches."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        cls.admin = User.objects.create_user(username='root', email='root@example.com', password='pw', role='admin')
+        cls.public_post = Post.objects.create(author=cls.alice, content='Hello', privacy='public')
+        cls.private_post = Post.objects.create(author=cls.alice, content='Secret', privacy='private')
+        cls.bob_private = Post.objects.create(author=cls.bob, content='Mine', privacy='private')
+        for i in range(3):
+            Comment.objects.create(author=cls.bob, post=cls.public_post, text=f'Comment {i}')
+        cls.public_post.likes.add(cls.bob)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_list_excludes_other_users_private_posts(self):
+        with self.assertNumQueries(2):  # count + page
+            response = self.client_for(self.bob).get(reverse('post-list-create'))
+        ids = {post['id'] for post in response.data['results']}
+        self.assertEqual(ids, {self.public_post.id, self.bob_private.id})
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client_for(self.bob).get(reverse('post-list-create'), {'fields': 'id,bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bogus', response.data['error'])
+        self.assertIn('content', response.data['error'])
+
+        response = self.client_for(self.bob).get(reverse('post-list-create'), {'fields': 'id,content'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'content'})
+
+    def test_detail_is_two_queries_regardless_of_comments(self):
+        with self.assertNumQueries(2):  # post with author and like state + comments with authors
+            response = self.client_for(self.bob).get(reverse('post-detail', args=[self.public_post.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['comments']), 3)
+        self.assertEqual(response.data['likes_count'], 1)
+        self.assertTrue(response.data['is_liked'])
+
+    def test_private_post_is_denied_without_being_loaded(self):
+        with self.assertNumQueries(2):  # filtered lookup + existence check
+            response = self.client_for(self.bob).get(reverse('post-detail', args=[self.private_post.id]))
+        self.assertEqual(response.status_code, 403)
+
+    def test_missing_post_is_404(self):
+        response = self.client_for(self.bob).get(reverse('post-detail', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_only_author_or_admin_can_delete(self):
+        url = reverse('post-detail', args=[self.public_post.id])
+        with self.assertNumQueries(2):
+            response = self.client_for(self.bob).delete(url)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client_for(self.admin).delete(url).status_code, 204)
+        self.assertFalse(Post.objects.filter(pk=self.public_post.id).exists())
+
+    def test_non_author_cannot_edit(self):
+        response = self.client_for(self.bob).patch(
+            reverse('post-detail', args=[self.public_post.id]), {'content': 'Hijacked'}, format='json',
+        )
+        self.assertEqual(response.status_code, 403)
+        self.public_post.refresh_from_db()
+        self.assertEqual(self.public_post.content, 'Hello')
+
+    def test_cannot_like_invisible_post(self):
+        response = self.client_for(self.bob).post(reverse('post-like-toggle', args=[self.private_post.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class LikeCountTests(TestCase):
+    """likes_received and the change log follow the like rows actually written."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        cls.post = Post.objects.create(author=cls.alice, content='Hello')
+
+    def likes_received(self):
+        return UserStats.objects.get(user=self.alice).likes_received
+
+    def test_toggle_counts_each_like_once(self):
+        client = APIClient()
+        client.force_authenticate(self.bob)
+        url = reverse('post-like-toggle', args=[self.post.id])
+        self.assertEqual(client.post(url).status_code, 201)
+        self.assertEqual(self.likes_received(), 1)
+        self.assertEqual(client.post(url).status_code, 200)
+        self.assertEqual(self.likes_received(), 0)
+        self.assertEqual(
+            list(ChangeLog.objects.filter(entity=ChangeLog.LIKE).order_by('pk').values_list('op', flat=True)),
+            [ChangeLog.UPSERT, ChangeLog.DELETE],
+        )
+
+    def test_removing_a_like_that_is_not_there_changes_nothing(self):
+        token = latest_token()
+        self.post.likes.remove(self.bob)
+        self.bob.liked_posts.remove(self.post)
+        self.assertEqual(self.likes_received(), 0)
+        self.assertFalse(ChangeLog.objects.filter(pk__gt=token, entity=ChangeLog.LIKE).exists())
+
+
+class LegacyUserEndpointTests(TestCase):
+    """The URLs of the retired connectly_project/posts app still work."""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='root', email='root@example.com', password='pw', role='admin')
+        self.client = APIClient()
+
+    def test_get_users(self):
+        response = self.client.get('/posts/users/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['username'], 'root')
+        self.assertTrue({'id', 'username', 'email', 'created_at'} <= set(response.json()[0]))
+
+    def test_create_user_without_password(self):
+        response = self.client.post('/posts/users/create/', {'username': 'carol', 'email': 'carol@example.com'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['message'], 'User created successfully')
+        user = User.objects.get(pk=response.json()['id'])
+        self.assertFalse(user.has_usable_password())
+
+    def test_create_duplicate_user_is_400(self):
+        response = self.client.post('/posts/users/create/', {'username': 'root', 'email': 'other@example.com'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+    def test_update_user_email(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.put(f'/posts/users/update/{self.admin.id}/', {'email': 'new@example.com'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.admin.refresh_from_db()
+        self.assertEqual(self.admin.email, 'new@example.com')
+
+    def test_delete_user_soft_deletes(self):
+        carol = User.objects.create_user(username='carol', email='carol@example.com')
+        self.client.force_authenticate(self.admin)
+        response = self.client.delete(f'/posts/users/delete/{carol.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], 'User deleted successfully')
+        carol.refresh_from_db()
+        self.assertIsNotNone(carol.deleted_at)
+        self.assertNotIn(carol.id, [user['id'] for user in self.client.get('/posts/users/').json()])
+
+    def test_other_users_cannot_update_or_delete(self):
+        carol = User.objects.create_user(username='carol', email='carol@example.com')
+        self.client.force_authenticate(carol)
+        self.assertEqual(self.client.put(f'/posts/users/update/{self.admin.id}/', {'email': 'x@example.com'}, format='json').status_code, 403)
+        self.assertEqual(self.client.delete(f'/posts/users/delete/{self.admin.id}/').status_code, 403)
+        self.admin.refresh_from_db()
+        self.assertEqual((self.admin.email, self.admin.deleted_at), ('root@example.com', None))
+
+        self.assertEqual(self.client.put(f'/posts/users/update/{carol.id}/', {'email': 'c2@example.com'}, format='json').status_code, 201)
+
+    def test_update_and_delete_unknown_user_is_404(self):
+        self.client.force_authenticate(self.admin)
+        self.assertEqual(self.client.put('/posts/users/update/999999/', {'email': 'x@example.com'}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete('/posts/users/delete/999999/').status_code, 404)
+
+
+class UserDetailTests(TestCase):
+    """Accounts can be read by anyone signed in but changed only by their owner or an admin."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        cls.admin = User.objects.create_user(username='root', email='root@example.com', password='pw', role='admin')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_other_users_cannot_update_or_delete(self):
+        url = reverse('user-detail', args=[self.alice.id])
+        client = self.client_for(self.bob)
+        self.assertEqual(client.get(url).status_code, 200)
+        self.assertEqual(client.patch(url, {'email': 'x@example.com'}, format='json').status_code, 403)
+        self.assertEqual(client.delete(url).status_code, 403)
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.email, self.alice.deleted_at), ('alice@example.com', None))
+
+    def test_owner_and_admin_can_update_and_delete(self):
+        url = reverse('user-detail', args=[self.alice.id])
+        response = self.client_for(self.alice).patch(url, {'email': 'a2@example.com'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client_for(self.admin).delete(url).status_code, 204)
+        self.alice.refresh_from_db()
+        self.assertIsNotNone(self.alice.deleted_at)
+
+
+class PostVersioningTests(TestCase):
+    """Edits are conditional on the version the client last read."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.post = Post.objects.create(author=cls.alice, content='Hello')
+        cls.comment = Comment.objects.create(author=cls.alice, post=cls.post, text='First')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+        self.url = reverse('post-detail', args=[self.post.id])
+
+    def test_get_returns_version_etag(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], '"v1"')
+        self.assertEqual(response.data['version'], 1)
+
+    def test_matching_if_match_updates_and_bumps_version(self):
+        response = self.client.patch(self.url, {'content': 'Edited'}, format='json', HTTP_IF_MATCH='W/"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"v2"')
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.content, self.post.version), ('Edited', 2))
+
+    def test_stale_if_match_is_412(self):
+        Post.objects.filter(pk=self.post.pk).update(version=2)
+        response = self.client.patch(self.url, {'content': 'Stale'}, format='json', HTTP_IF_MATCH='"v1"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], '"v2"')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.content, 'Hello')
+
+    def test_comment_edits_are_versioned(self):
+        url = reverse('comment-detail', args=[self.comment.id])
+        self.assertEqual(self.client.get(url)['ETag'], '"v1"')
+        response = self.client.patch(url, {'text': 'Edited'}, format='json', HTTP_IF_MATCH='"v1"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"v2"')
+        self.assertEqual(response.data['version'], 2)
+
+        response = self.client.patch(url, {'text': 'Stale'}, format='json', HTTP_IF_MATCH='"v1"')
+        self.assertEqual(response.status_code, 412)
+        self.comment.refresh_from_db()
+        self.assertEqual((self.comment.text, self.comment.version), ('Edited', 2))
+
+    def test_edit_without_if_match_still_bumps_version(self):
+        response = self.client.patch(self.url, {'content': 'Edited'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], '"v2"')
+
+
+def _retry_when_locked(request):
+    """Run ``request`` until SQLite's shared-cache test database lets it through."""
+    while True:
+        try:
+            return request()
+        except OperationalError as exc:
+            if 'locked' not in str(exc):
+                raise
+            time.sleep(0.01)
+
+
+def _edit_until_applied(url, user, name, edits, results):
+    """Append ``edits`` markers to the post's content, retrying on conflicts.
+
+    A "locked" error can also hit a query that runs after the edit committed,
+    so an interrupted edit is only retried if its marker did not land.
+    """
+    client = APIClient()
+    client.force_authenticate(user)
+    conflicts = 0
+    try:
+        for n in range(edits):
+            marker = f'{name}.{n}'
+            while True:
+                current = _retry_when_locked(lambda: client.get(url))
+                if marker in current.data['content'].split():
+                    break
+                try:
+                    response = client.patch(
+                        url, {'content': f"{current.data['content']} {marker}"},
+                        format='json', HTTP_IF_MATCH=current['ETag'],
+                    )
+                except OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    continue
+                if response.status_code == 412:
+                    conflicts += 1
+                    continue
+                assert response.status_code == 200, response.status_code
+                break
+        results.append(conflicts)
+    finally:
+        connection.close()
+
+
+class ConcurrentPostEditTests(TransactionTestCase):
+    """Racing edits from several threads never overwrite each other."""
+
+    threads = 8
+    edits_per_thread = 10
+
+    def test_no_lost_updates(self):
+        alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        post = Post.objects.create(author=alice, content='start')
+        url = reverse('post-detail', args=[post.id])
+
+        results = []
+        workers = [
+            threading.Thread(target=_edit_until_applied, args=(url, alice, f't{i}', self.edits_per_thread, results))
+            for i in range(self.threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+
+        self.assertEqual(len(results), self.threads)
+        self.assertGreater(sum(results), 0, "the threads never raced")
+        post.refresh_from_db()
+        # A lost update would drop markers; a double apply would repeat one
+        markers = post.content.split()[1:]
+        expected = {f't{i}.{n}' for i in range(self.threads) for n in range(self.edits_per_thread)}
+        self.assertEqual(len(markers), len(expected))
+        self.assertEqual(set(markers), expected)
+        self.assertEqual(post.version, len(expected) + 1)
+
+
+class TaggingTests(TestCase):
+    """Hashtags and mentions are indexed on write and rebuilt after bulk imports."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        cls.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_tag_named_trending_is_listed(self):
+        response = self.client.post(reverse('post-list-create'), {'content': 'Hot #Trending, thanks @bob.'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        tagged = self.client.get(reverse('tag-posts', args=['trending']))
+        self.assertEqual([post['id'] for post in tagged.data['results']], [response.data['id']])
+        mentions = self.client.get(reverse('user-mentions', args=[self.bob.id]))
+        self.assertEqual([post['id'] for post in mentions.data['results']], [response.data['id']])
+        trending = self.client.get(reverse('trending-tags'))
+        self.assertEqual(trending.data['tags'], [{'tag': 'trending', 'count': 1}])
+
+    def test_reindex_covers_bulk_inserted_rows(self):
+        post, = Post.objects.bulk_create([Post(author=self.alice, content='#imported by @alice')])
+        Comment.objects.bulk_create([Comment(author=self.bob, post=post, text='hi @bob')])
+        self.assertFalse(PostTag.objects.exists())
+
+        self.assertEqual(tagging.reindex(chunk_size=1), 1)
+        self.assertEqual(list(PostTag.objects.values_list('post_id', 'tag__name')), [(post.id, 'imported')])
+        comment = Comment.objects.get()
+        self.assertEqual(
+            set(Mention.objects.values_list('user__username', 'post_id', 'comment_id')),
+            {('alice', post.id, None), ('bob', post.id, comment.id)},
+        )
+
+
+class IdempotencyTests(TestCase):
+    """Idempotency-Key records and their lock live in one uniquely keyed row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_retry_is_replayed(self):
+        url = reverse('post-list-create')
+        first = self.client.post(url, {'content': 'Once'}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        retry = self.client.post(url, {'content': 'Once'}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual((first.status_code, retry.status_code), (201, 201))
+        self.assertEqual(retry.json()['id'], first.data['id'])
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Post.objects.count(), 1)
+
+        other_body = self.client.post(url, {'content': 'Twice'}, format='json', HTTP_IDEMPOTENCY_KEY='k1')
+        self.assertEqual(other_body.status_code, 422)
+
+    def test_duplicate_is_turned_away_while_first_runs(self):
+        claimed, record = idempotency._claim('a' * 64, 'f')
+        self.assertTrue(claimed)
+        self.assertEqual(idempotency._claim('a' * 64, 'f'), (False, None))
+
+        # An abandoned lock is taken over once it times out
+        IdempotencyKey.objects.filter(pk=record.pk).update(
+            created_at=record.created_at - timedelta(seconds=idempotency.LOCK_TIMEOUT + 1),
+        )
+        claimed, _ = idempotency._claim('a' * 64, 'f')
+        self.assertTrue(claimed)
+
+    def test_expired_keys_are_purged_without_a_worker(self):
+        _, expired = idempotency._claim('b' * 64, 'f')
+        IdempotencyKey.objects.filter(pk=expired.pk).update(
+            created_at=expired.created_at - timedelta(seconds=idempotency.get_ttl() + 1),
+        )
+        with mock.patch.object(idempotency, '_next_purge', 0.0):
+            idempotency._claim('c' * 64, 'f')
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['c' * 64])
+
+
+class ArchiveTests(TestCase):
+    """Archived posts stay deletable by their author and survive export/import."""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        self.bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        self.post = Post.objects.create(author=self.alice, content='Old')
+        Comment.objects.create(author=self.bob, post=self.post, text='Reply')
+        self.post.likes.add(self.bob)
+        archive_posts(timezone.now() + timedelta(seconds=1))
+        self.url = reverse('post-detail', args=[self.post.id])
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def test_only_author_can_delete_archived_post(self):
+        self.assertEqual(self.client_for(self.bob).delete(self.url).status_code, 403)
+        self.assertEqual(self.client_for(self.alice).patch(self.url, {'content': 'New'}, format='json').status_code, 409)
+
+        self.assertEqual(self.client_for(self.alice).delete(self.url).status_code, 204)
+        self.assertFalse(ArchivedPost.objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+        self.assertEqual(
+            UserStats.objects.filter(user=self.alice).values_list('post_count', 'likes_received').get(), (0, 0),
+        )
+        self.assertEqual(UserStats.objects.get(user=self.bob).comment_count, 0)
+
+    def test_export_import_round_trip_keeps_archive(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        call_command('export_connectly', directory, stdout=io.StringIO())
+        User.objects.all().delete()
+
+        call_command('import_connectly', directory, stdout=io.StringIO())
+        post = ArchivedPost.objects.get()
+        self.assertEqual((post.id, post.content, post.like_user_ids), (self.post.id, 'Old', [self.bob.id]))
+        self.assertEqual(ArchivedComment.objects.get().text, 'Reply')
+        self.assertEqual(UserStats.objects.get(user=self.alice).post_count, 1)
+
+
+class DataTransferTests(TestCase):
+    """Export leaves only finished files behind and import can be re-run."""
+
+    def test_import_is_repeatable_after_losing_its_checkpoint(self):
+        alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        post = Post.objects.create(author=alice, content='Hello #django')
+        Comment.objects.create(author=alice, post=post, text='Reply')
+        post.likes.add(alice)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        call_command('export_connectly', directory, stdout=io.StringIO())
+        self.assertFalse([name for name in os.listdir(directory) if name.endswith('.tmp')])
+        User.objects.all().delete()
+
+        call_command('import_connectly', directory, stdout=io.StringIO())
+        # As if the last file committed but its checkpoint was never written
+        os.remove(os.path.join(directory, 'import', 'checkpoint.json'))
+        call_command('import_connectly', directory, stdout=io.StringIO())
+        self.assertEqual(Post.objects.get().likes.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(UserStats.objects.get(user=alice).post_count, 1)
+
+
+class TaskQueueTests(TransactionTestCase):
+    """Queued tasks are claimed once, retried with backoff and deduplicated by key."""
+
+    def setUp(self):
+        _task_calls.clear()
+
+    def test_claim_and_run(self):
+        task = _record_call.delay(1)
+        self.assertEqual(taskqueue.claim_due_tasks(limit=10), [task.pk])
+        # Leased to the first worker until it finishes or the lease runs out
+        self.assertEqual(taskqueue.claim_due_tasks(limit=10), [])
+
+        taskqueue.run_task(task.pk)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, _task_calls), (Task.DONE, 1, [1]))
+
+    def test_failures_are_retried_with_backoff_then_marked_failed(self):
+        task = _always_fail.delay()
+        taskqueue.claim_due_tasks(limit=10)
+        before = timezone.now()
+        with self.assertLogs('posts.taskqueue', 'WARNING'):
+            taskqueue.run_task(task.pk)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertGreaterEqual(task.run_at, before + timedelta(seconds=taskqueue.get_config()['RETRY_BACKOFF']))
+        self.assertIn('boom', task.last_error)
+        self.assertEqual(taskqueue.claim_due_tasks(limit=10), [])
+
+        Task.objects.filter(pk=task.pk).update(run_at=timezone.now())
+        self.assertEqual(taskqueue.claim_due_tasks(limit=10), [task.pk])
+        with self.assertLogs('posts.taskqueue', 'ERROR'):
+            taskqueue.run_task(task.pk)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+    def test_same_idempotency_key_is_queued_once(self):
+        self.assertIsNotNone(taskqueue.enqueue(_record_call, 1, idempotency_key='once'))
+        self.assertIsNone(taskqueue.enqueue(_record_call, 2, idempotency_key='once'))
+        self.assertEqual(list(Task.objects.values_list('args', flat=True)), [[1]])
+
+    @override_settings(TASK_QUEUE={'EAGER': True})
+    def test_eager_mode_runs_inline(self):
+        self.assertIsNone(_record_call.delay(3))
+        self.assertEqual(_task_calls, [3])
+        self.assertFalse(Task.objects.exists())
+
+    def test_worker_drains_due_tasks_and_purges_old_ones(self):
+        old = Task.objects.create(name='posts.tests.record_call', args=[0], status=Task.DONE)
+        Task.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        _record_call.delay(4)
+
+        call_command('run_tasks', '--once', '--threads', '1', stdout=io.StringIO())
+        self.assertEqual(_task_calls, [4])
+        self.assertEqual(list(Task.objects.values_list('status', flat=True)), [Task.DONE])
+
+
+class SoftDeleteSyncTests(TestCase):
+    """Content hidden by a user soft delete is tombstoned right away."""
+
+    def test_user_soft_delete_tombstones_posts_and_comments(self):
+        alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        bob = User.objects.create_user(username='bob', email='bob@example.com', password='pw')
+        alice_post = Post.objects.create(author=alice, content='Mine')
+        bob_post = Post.objects.create(author=bob, content='Yours')
+        on_alice = Comment.objects.create(author=bob, post=alice_post, text='On hers')
+        by_alice = Comment.objects.create(author=alice, post=bob_post, text='By her')
+        token = latest_token()
+
+        soft_delete_user(alice)
+        deleted = build_sync_payload(bob, token, 100)['deleted']
+        self.assertEqual(deleted['posts'], [alice_post.id])
+        self.assertEqual(deleted['comments'], sorted([on_alice.id, by_alice.id]))
+        self.assertEqual(Task.objects.get(name='posts.tasks.purge_user').args, [alice.id])
+
+    def test_post_soft_delete_tombstones_comments_once(self):
+        alice = User.objects.create_user(username='alice', email='alice@example.com', password='pw')
+        post = Post.objects.create(author=alice, content='Mine')
+        comment = Comment.objects.create(author=alice, post=post, text='Reply')
+        token = latest_token()
+
+        soft_delete_post(post)
+        deleted = build_sync_payload(alice, token, 100)['deleted']
+        self.assertEqual((deleted['posts'], deleted['comments']), ([post.id], [comment.id]))
+
+        # The purge removes rows that are already tombstoned
+        purge_post(post.id)
+        self.assertFalse(Post.all_objects.filter(pk=post.id).exists())
+        self.assertEqual(ChangeLog.objects.filter(pk__gt=token, op=ChangeLog.DELETE).count(), 2)
@@ -1,26 +1,39 @@
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 from .views import (
-    UserListCreate, UserDetail, 
-    PostListCreate, PostDetail, PostLikeToggle, 
+    UserListCreate, UserDetail, UserProfile,
+    PostListCreate, PostDetail, PostLikeToggle, PostLikeState,
     CommentListCreate, CommentDetail, GoogleLoginCallbackApi, GoogleLoginRedirectApi,
-    NewsFeedAPIView
+    NewsFeedAPIView, SyncAPIView, TagPostList, UserMentionList, TrendingTags
 )
 from . import views
+from .legacy import LegacyUserCreate, LegacyUserUpdate, LegacyUserDelete
 urlpatterns = [
     # User Endpoints
     path('users/', UserListCreate.as_view(), name='user-list-create'),
     path('users/<int:pk>/', UserDetail.as_view(), name='user-detail'), 
+    path('users/<int:pk>/profile/', UserProfile.as_view(), name='user-profile'),
+    path('users/<int:pk>/mentions/', UserMentionList.as_view(), name='user-mentions'),
+
+    # Legacy user endpoints from the retired connectly_project/posts app
+    path('users/create/', LegacyUserCreate.as_view(), name='create_user'),
+    path('users/update/<int:id>/', LegacyUserUpdate.as_view(), name='update_user'),
+    path('users/delete/<int:id>/', LegacyUserDelete.as_view(), name='delete_user'),
 
     # Post Endpoints
     path('posts/', PostListCreate.as_view(), name='post-list-create'),
     path('posts/<int:pk>/', PostDetail.as_view(), name='post-detail'),  
     path('posts/<int:pk>/like/', PostLikeToggle.as_view(), name='post-like-toggle'), 
+    path('posts/likes/', PostLikeState.as_view(), name='post-like-state'),
 
     # Comment Endpoints
     path('comments/', CommentListCreate.as_view(), name='comment-list-create'),
     path('comments/<int:pk>/', CommentDetail.as_view(), name='comment-detail'), 
 
+    # Hashtag Endpoints
+    path('tags/<str:tag>/', TagPostList.as_view(), name='tag-posts'),
+    path('trending-tags/', TrendingTags.as_view(), name='trending-tags'),
+
     # Google Authentication
     path('auth/google/login/', GoogleLoginRedirectApi.as_view(), name='google-login-redirect'),
     path('auth/google/callback/', GoogleLoginCallbackApi.as_view(), name='google-login-callback'),
@@ -35,6 +48,9 @@ urlpatterns = [
     # News Feed
     path('newsfeed/', NewsFeedAPIView.as_view(), name='news-feed'),
 
+    # Delta Sync
+    path('sync/', SyncAPIView.as_view(), name='sync'),
+
     # Token Authentication
     path('api/token/', obtain_auth_token, name='api_token_auth'),
     
@@ -0,0 +1,92 @@
+"""Optimistic locking for post and comment edits.
+
+Versioned rows carry a ``version`` counter that every edit bumps with a
+conditional ``UPDATE ... WHERE version = <version read>``. When two edits
+race, only one of them matches the row and the other is rejected instead of
+silently overwriting it, so edits do not need to be serialized through a
+single worker. Reads send the version as an ``ETag``; clients echo it in
+``If-Match`` and get 412 when the row has moved on since.
+"""
+from django.db import transaction
+from django.db.models import F
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def etag_for(instance):
+    return f'"v{instance.version}"'
+
+
+def if_match_versions(request):
+    """Versions listed in ``If-Match``, ``None`` without the header or for ``*``.
+
+    The compression middleware weakens ETags it passes through, so the
+    ``W/`` prefix is accepted here as well.
+    """
+    header = request.headers.get('If-Match')
+    if header is None or header.strip() == '*':
+        return None
+    versions = set()
+    for tag in header.split(','):
+        tag = tag.strip().removeprefix('W/').strip('"')
+        if tag.startswith('v') and tag[1:].isdigit():
+            versions.add(int(tag[1:]))
+    return versions
+
+
+def update_if_version(instance, version, values):
+    """Write ``values`` to ``instance`` only if its row is still at ``version``."""
+    model = type(instance)
+    updated = model._base_manager.filter(pk=instance.pk, version=version, deleted_at__isnull=True).update(
+        version=F('version') + 1, **values,
+    )
+    if not updated:
+        return False
+    for name, value in values.items():
+        setattr(instance, name, value)
+    instance.version = version + 1
+    return True
+
+
+class OptimisticLockMixin:
+    """Versioned retrieve and update for ``RetrieveUpdateDestroyAPIView`` subclasses.
+
+    ``update()`` and its conditional UPDATE skip ``save()`` and its signals,
+    so views do their post-write bookkeeping in ``after_update``.
+    """
+
+    def versioned_response(self, instance, data, status_code=status.HTTP_200_OK):
+        return Response(data, status=status_code, headers={'ETag': etag_for(instance)})
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.versioned_response(instance, self.get_serializer(instance).data)
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        instance = self.get_object()
+        expected = if_match_versions(request)
+        if expected is not None and instance.version not in expected:
+            return self.edit_conflict(status.HTTP_412_PRECONDITION_FAILED, instance)
+
+        serializer = self.get_serializer(instance, data=request.data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            if not update_if_version(instance, instance.version, serializer.validated_data):
+                # Someone else saved between our read and our write
+                return self.edit_conflict(
+                    status.HTTP_412_PRECONDITION_FAILED if expected is not None else status.HTTP_409_CONFLICT
+                )
+            self.after_update(instance)
+        return self.versioned_response(instance, serializer.data)
+
+    def after_update(self, instance):
+        pass
+
+    def edit_conflict(self, status_code, current=None):
+        name = self.get_queryset().model._meta.verbose_name
+        return Response(
+            {"error": f"This {name} was changed by someone else. Reload it and try again."},
+            status=status_code,
+            headers={'ETag': etag_for(current)} if current is not None else None,
+        )
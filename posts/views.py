@@ -2,17 +2,29 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, permissions
 from rest_framework.generics import get_object_or_404
-from .models import User, Post, Comment
-from .serializers import UserSerializer, PostSerializer, CommentSerializer
+from .models import User, Post, Comment, ArchivedPost, ChangeLog, UserStats, Mention, PostTag
+from .serializers import (
+    UserSerializer, UserProfileSerializer, PostSerializer, CommentSerializer, ArchivedPostSerializer, requested_fields,
+)
+from . import stats, tagging
+from .changelog import build_sync_payload, latest_token, record_change
+from .renderers import SYNC_RENDERER_CLASSES
+from .deletion import delete_archived_post, soft_delete_post, soft_delete_user
+from .idempotency import idempotent
+from .permissions import IsAccountOwnerOrAdmin
+from .versioning import OptimisticLockMixin
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authtoken.models import Token
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.shortcuts import redirect
+from django.http import Http404
 from urllib.parse import urlencode
 import requests
 from django.core.cache import cache
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from django.db.models import Count, Exists, OuterRef, Prefetch, Q
+from django.db import IntegrityError, transaction
 
 User  = get_user_model()
 
@@ -20,6 +32,41 @@ User  = get_user_model()
 class PostPagination(PageNumberPagination):
     page_size = 10
 
+# Keyset pagination for lookups that can reach deep into old posts
+class PostCursorPagination(CursorPagination):
+    page_size = 10
+    ordering = '-created_at'
+
+# Feed payload shaping: comments are only embedded with ?expand=comments,
+# and only the work needed for the requested ?fields= is done
+class ShapedPostFeedMixin:
+    collapsed_fields = ('comments',)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['collapsed_fields'] = self.collapsed_fields
+        return context
+
+    def shape_queryset(self, queryset):
+        fields, expand = requested_fields(self.request)
+
+        def wanted(name):
+            return not fields or name in fields
+
+        if wanted('author'):
+            queryset = queryset.select_related('author')
+        if wanted('likes_count'):
+            queryset = queryset.annotate(num_likes=Count('likes'))
+        if wanted('is_liked'):
+            queryset = queryset.annotate(liked_by_me=Exists(
+                Post.likes.through.objects.filter(post_id=OuterRef('pk'), user_id=self.request.user.pk)
+            ))
+        if 'comments' in expand or 'comments' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('comments', queryset=Comment.objects.select_related('author'))
+            )
+        return queryset
+
 def home(request):
     return render(request, "home.html")
 
@@ -32,16 +79,14 @@ class UserListCreate(APIView):
     permission_classes = [AllowAny]
 
     def get(self, request):
-        users = User.objects.all()
+        # One LEFT JOIN instead of a token query per user
+        users = User.objects.filter(deleted_at__isnull=True).select_related('auth_token')
         serialized_users = []
 
         for user in users:
             user_data = UserSerializer(user).data
-            try:
-                token = Token.objects.get(user=user)
-                user_data["token"] = token.key
-            except Token.DoesNotExist:
-                user_data["token"] = None
+            token = getattr(user, 'auth_token', None)
+            user_data["token"] = token.key if token is not None else None
 
             serialized_users.append(user_data)
 
@@ -62,81 +107,271 @@ class UserListCreate(APIView):
 
 # User Detail API
 class UserDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = User.objects.all()
+    queryset = User.objects.filter(deleted_at__isnull=True)
     serializer_class = UserSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, IsAccountOwnerOrAdmin]
     lookup_field = 'pk'
 
+    def perform_destroy(self, instance):
+        # Hide the user's content now and purge it in the background
+        soft_delete_user(instance)
+
+# User Profile API
+class UserProfile(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        # Served from the incrementally maintained stats row: one PK lookup
+        profile = UserStats.objects.select_related('user').filter(user_id=pk, user__deleted_at__isnull=True).first()
+        if profile is None:
+            if not User.objects.filter(pk=pk, deleted_at__isnull=True).exists():
+                raise Http404
+            stats.rebuild([pk])
+            profile = UserStats.objects.select_related('user').get(user_id=pk)
+        return Response(UserProfileSerializer(profile).data)
+
 # Post List & Create API
-class PostListCreate(generics.ListCreateAPIView):
+class PostListCreate(ShapedPostFeedMixin, generics.ListCreateAPIView):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = PostPagination
 
+    def get_queryset(self):
+        return self.shape_queryset(super().get_queryset().visible_to(self.request.user))
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        # The post, its tags and mentions and its author's stats are written together
+        with transaction.atomic():
+            post = serializer.save(author=self.request.user)
+            tagging.index_post(post)
 
-class PostDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.all()
+class PostDetail(OptimisticLockMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PostSerializer
     permission_classes = [permissions.IsAuthenticated]
+    denied_messages = {
+        'GET': "You do not have permission to view this post.",
+        'DELETE': "You do not have permission to delete this post.",
+    }
+
+    # Privacy and role rules are applied in SQL, so posts the user may not
+    # see or change are never loaded
+    def get_queryset(self):
+        user = self.request.user
+        if self.request.method == 'GET':
+            return (
+                Post.objects.visible_to(user)
+                .select_related('author')
+                .with_like_state(user)
+                .prefetch_related(Prefetch('comments', queryset=Comment.objects.select_related('author')))
+            )
+        if self.request.method == 'DELETE':
+            return Post.objects.deletable_by(user)
+        return Post.objects.editable_by(user)
+
+    def not_found_or_denied(self, pk):
+        """Tell a missing post from a forbidden one without fetching it."""
+        message = self.denied_messages.get(self.request.method, "You do not have permission to edit this post.")
+        if Post.objects.filter(pk=pk).exists():
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
+        # Old posts are moved to the archive tables; resolve them transparently
+        user = self.request.user
+        archived = ArchivedPost.objects.filter(pk=pk, author__deleted_at__isnull=True)
+        if self.request.method == 'GET':
+            post = (
+                archived.filter(Q(privacy='public') | Q(author_id=user.pk))
+                .select_related('author')
+                .prefetch_related('comments__author')
+                .first()
+            )
+            if post is not None:
+                return Response(ArchivedPostSerializer(post, context=self.get_serializer_context()).data)
+        else:
+            # Same author-or-admin rule as editable_by/deletable_by
+            post = (archived if getattr(user, 'role', None) == 'admin' else archived.filter(author_id=user.pk)).first()
+            if post is not None:
+                if self.request.method == 'DELETE':
+                    delete_archived_post(post)
+                    return Response(status=status.HTTP_204_NO_CONTENT)
+                return Response({"error": "Archived posts are read-only."}, status=status.HTTP_409_CONFLICT)
+        if archived.exists():
+            return Response({"error": message}, status=status.HTTP_403_FORBIDDEN)
+        raise Http404
 
     def get(self, request, *args, **kwargs):
-        post = self.get_object()
-        if post.privacy == 'private' and post.author != request.user:
-            return Response({"error": "You do not have permission to view this post."}, status=status.HTTP_403_FORBIDDEN)
-        return super().get(request, *args, **kwargs)
+        try:
+            post = self.get_object()
+        except Http404:
+            return self.not_found_or_denied(kwargs['pk'])
+        return self.versioned_response(post, self.get_serializer(post).data)
+
+    # Edits are conditional on the version read (or sent as If-Match)
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except Http404:
+            return self.not_found_or_denied(kwargs['pk'])
 
     def delete(self, request, *args, **kwargs):
-        post = self.get_object()
-        # Check if the user is the author of the post or an admin
-        if post.author != request.user and request.user.role != 'admin':
-            return Response({"error": "You do not have permission to delete this post."}, status=status.HTTP_403_FORBIDDEN)
-        
+        try:
+            post = self.get_object()
+        except Http404:
+            return self.not_found_or_denied(kwargs['pk'])
+
         # Proceed with deletion
         self.perform_destroy(post)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def after_update(self, post):
+        record_change(ChangeLog.POST, post.pk)
+        tagging.index_post(post)
+
+    def perform_destroy(self, instance):
+        soft_delete_post(instance)
+
         
 # Like & Unlike Post API
 class PostLikeToggle(APIView):
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def post(self, request, pk):
-        post = get_object_or_404(Post, id=pk)
         user = request.user
-
-        if user in post.likes.all():
-            post.likes.remove(user)
-            return Response({"message": "Like removed."}, status=status.HTTP_200_OK)
-        else:
-            post.likes.add(user)
+        post = get_object_or_404(Post.objects.visible_to(user), id=pk)
+
+        # Counters and the change log follow the rows actually written, so two
+        # overlapping toggles cannot both count the same like
+        Like = Post.likes.through
+        with transaction.atomic():
+            removed, _ = Like.objects.filter(post=post, user=user).delete()
+            if removed:
+                record_change(ChangeLog.LIKE, post.pk, ChangeLog.DELETE, user_id=user.pk)
+                stats.adjust(post.author_id, likes_received=-removed)
+                return Response({"message": "Like removed."}, status=status.HTTP_200_OK)
+            try:
+                with transaction.atomic():
+                    Like.objects.create(post=post, user=user)
+            except IntegrityError:
+                # A concurrent toggle added the same like first
+                pass
+            else:
+                record_change(ChangeLog.LIKE, post.pk, ChangeLog.UPSERT, user_id=user.pk)
+                stats.adjust(post.author_id, likes_received=1)
             return Response({"message": "Post liked."}, status=status.HTTP_201_CREATED)
 
+# Bulk Like State API
+class PostLikeState(APIView):
+    permission_classes = [IsAuthenticated]
+    max_ids = 100
+
+    def get(self, request):
+        try:
+            post_ids = {int(pk) for pk in request.query_params.get('ids', '').split(',') if pk.strip()}
+        except ValueError:
+            return Response({"error": "ids must be a comma-separated list of post ids."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(post_ids) > self.max_ids:
+            return Response({"error": f"At most {self.max_ids} ids per request."}, status=status.HTTP_400_BAD_REQUEST)
+
+        liked = set(
+            Post.likes.through.objects
+            .filter(user_id=request.user.pk, post_id__in=post_ids)
+            .values_list('post_id', flat=True)
+        ) if post_ids else set()
+        return Response({"likes": {str(pk): pk in liked for pk in sorted(post_ids)}})
+
 # Comment List & Create API
 class CommentListCreate(generics.ListCreateAPIView):
-    queryset = Comment.objects.all().order_by('-created_at')
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return Comment.objects.visible_to(self.request.user).select_related('author').order_by('-created_at')
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(author=self.request.user)
+            tagging.index_comment(comment)
 
 # Comment Detail, Update, Delete API
-class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Comment.objects.all()
+class CommentDetail(OptimisticLockMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_queryset(self):
+        return Comment.objects.visible_to(self.request.user).select_related('author')
+
+    def after_update(self, comment):
+        record_change(ChangeLog.COMMENT, comment.pk)
+        tagging.index_comment(comment)
+
+# Posts by Hashtag
+class TagPostList(ShapedPostFeedMixin, generics.ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PostCursorPagination
+
+    def get_queryset(self):
+        # A subquery rather than a join, so likes_count is not multiplied
+        tagged = PostTag.objects.filter(tag__name=self.kwargs['tag'].lstrip('#').lower()).values('post_id')
+        return self.shape_queryset(Post.objects.visible_to(self.request.user).filter(pk__in=tagged))
+
+# Posts Mentioning a User
+class UserMentionList(ShapedPostFeedMixin, generics.ListAPIView):
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PostCursorPagination
+
+    def get_queryset(self):
+        # Mentions in comments list the post that was commented on
+        mentioned = Mention.objects.filter(user_id=self.kwargs['pk']).values('post_id')
+        return self.shape_queryset(Post.objects.visible_to(self.request.user).filter(pk__in=mentioned))
+
+# Trending Hashtags
+class TrendingTags(APIView):
+    permission_classes = [IsAuthenticated]
+    window_hours = 24
+    cache_timeout = 60
+
+    def get(self, request):
+        trending = cache.get_or_set(
+            'trending-tags', lambda: tagging.trending_tags(self.window_hours), self.cache_timeout,
+        )
+        return Response({"tags": [{"tag": name, "count": uses} for name, uses in trending]})
+
 # Personalized News Feed
-class NewsFeedAPIView(generics.ListAPIView):
+class NewsFeedAPIView(ShapedPostFeedMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
     pagination_class = PostPagination
 
     def get_queryset(self):
-        return Post.objects.filter(privacy='public').order_by('-created_at')
+        return self.shape_queryset(Post.objects.filter(privacy='public').order_by('-created_at'))
+
+# Delta Sync API
+class SyncAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    renderer_classes = SYNC_RENDERER_CLASSES
+    max_changes = 500
+
+    def get(self, request):
+        since = request.query_params.get('since')
+        if since is None:
+            # Bootstrap: clients load pages as usual, then sync from this token
+            return Response({"token": str(latest_token())})
+        try:
+            since = int(since)
+        except ValueError:
+            return Response({"error": "Invalid sync token."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(build_sync_payload(request.user, since, self.max_changes))
 
 # Google Login Redirect API
 class GoogleLoginRedirectApi(APIView):
@@ -179,7 +414,7 @@ class GoogleLoginCallbackApi(APIView):
             "redirect_uri": settings.GOOGLE_OAUTH2_REDIRECT_URI,
         }
 
-        token_response = requests.post(token_url, data=data)
+        token_response = requests.post(token_url, data=data, timeout=10)
         token_data = token_response.json()
 
         if "error" in token_data:
@@ -190,7 +425,7 @@ class GoogleLoginCallbackApi(APIView):
         # Get user info from Google
         user_info_url = "https://www.googleapis.com/oauth2/v1/userinfo"
         headers = {"Authorization": f"Bearer {access_token}"}
-        user_info_response = requests.get(user_info_url, headers=headers)
+        user_info_response = requests.get(user_info_url, headers=headers, timeout=10)
         user_info = user_info_response.json()
 
         if "email" not in user_info: